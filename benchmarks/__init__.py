@@ -0,0 +1,9 @@
+"""
+Benchmarks of the solutions of every level, over generated inputs of growing
+size. Run them with:
+    python -m benchmarks --output results.json
+and compare two runs with:
+    python -m benchmarks --compare baseline.json results.json
+"""
+
+from benchmarks.harness import compare, measure, run_benchmarks
@@ -0,0 +1,74 @@
+import argparse
+import sys
+
+from benchmarks.families import FAMILIES
+from benchmarks.harness import (
+    compare,
+    measure_startup,
+    read_results,
+    run_benchmarks,
+    write_results,
+)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmarks of the foobar solutions over growing inputs.",
+    )
+    parser.add_argument(
+        "solvers", nargs="*", help="solvers to run (all of them by default)"
+    )
+    parser.add_argument("--output", help="where to write the results (JSON)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="compare two results files instead of running the benchmarks",
+    )
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="add the counters, timers and histograms of the solvers to the results",
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="also measure the startup time of a process hosting every solver",
+    )
+    options = parser.parse_args(arguments)
+    for solver in options.solvers:
+        if solver not in FAMILIES:
+            parser.error(
+                "unknown solver %r (choose from %s)"
+                % (solver, ", ".join(sorted(FAMILIES)))
+            )
+
+    if not options.compare:
+        results = run_benchmarks(
+            options.solvers,
+            options.repeat,
+            options.seed,
+            instrumented=options.instrument,
+        )
+        if options.startup:
+            results["startup"] = measure_startup()
+        if options.output:
+            write_results(results, options.output)
+        return 0
+
+    baseline, current = (read_results(path) for path in options.compare)
+    regressions = compare(baseline, current, options.threshold)
+    for solver, size, metric, previous, value in regressions:
+        print(
+            "%-26s size %10d: %s went from %g to %g"
+            % (solver, size, metric, previous, value)
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Input families for every solver: for each size, a list of argument tuples for
+the solver's solution(). Inputs are built from a seeded random generator, so
+that two runs measure the same inputs.
+"""
+
+import random
+import string
+
+
+def re_id(module, size, randomizer):
+    # size: largest index
+    return [(randomizer.randrange(size),) for _ in range(100)]
+
+
+def elevator_maintenance(module, size, randomizer):
+    # size: number of versions
+    versions = [
+        ".".join(
+            str(randomizer.randint(0, 50)) for _ in range(randomizer.randint(1, 3))
+        )
+        for _ in range(size)
+    ]
+    return [(versions,)]
+
+
+def bunny_prisoner_locating(module, size, randomizer):
+    # size: largest coordinate
+    return [
+        (randomizer.randint(1, size), randomizer.randint(1, size)) for _ in range(1000)
+    ]
+
+
+def fuel_injection_perfection(module, size, randomizer):
+    # size: number of digits
+    return [
+        (
+            randomizer.choice("123456789")
+            + "".join(randomizer.choice(string.digits) for _ in range(size - 1)),
+        )
+        for _ in range(10)
+    ]
+
+
+def bomb_baby(module, size, randomizer):
+    # size: number of generations, with consecutive Fibonacci numbers (worst case)
+    fibonacci = [1, 1]
+    while len(fibonacci) < size + 2:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    return [(str(fibonacci[-1]), str(fibonacci[-2]))] * 10
+
+
+def doomsday_fuel(module, size, randomizer):
+    # size: number of transient states
+    return [(module.random_absorbing_chain(size, 4, randomizer),)]
+
+
+def free_the_bunny_prisoners(module, size, randomizer):
+    # size: number of bunnies
+    return [(size, size // 2)]
+
+
+def escape_pods(module, size, randomizer):
+    # size: number of rooms
+    matrix = module.random_corridors(size, 5, randomizer)
+    return [(list(range(size // 10)), list(range(size - size // 10, size)), matrix)]
+
+
+def expanding_nebula(module, size, randomizer):
+    # size: width of a nebula of height 9
+    state = [[randomizer.random() < 0.5 for _ in range(size + 1)] for _ in range(10)]
+    return [(module.evolve(state),)]
+
+
+# solver name -> (input family, sizes)
+FAMILIES = {
+    "re-id": (re_id, (10**3, 10**4, 10**5, 10**6)),
+    "elevator-maintenance": (elevator_maintenance, (10**2, 10**3, 10**4, 10**5)),
+    "bunny-prisoner-locating": (bunny_prisoner_locating, (10, 10**3, 10**6, 10**9)),
+    "fuel-injection-perfection": (fuel_injection_perfection, (10, 100, 1000, 10000)),
+    "bomb-baby": (bomb_baby, (100, 1000, 5000)),
+    "doomsday-fuel": (doomsday_fuel, (5, 10, 25, 50)),
+    "free-the-bunny-prisoners": (free_the_bunny_prisoners, (5, 9, 12, 15)),
+    "escape-pods": (escape_pods, (50, 200, 1000)),
+    "expanding-nebula": (expanding_nebula, (10, 20, 50)),
+}
+
+
+def generate_inputs(name, module, seed=0):
+    """
+    Yields (size, list of argument tuples) for the given solver.
+    """
+    family, sizes = FAMILIES[name]
+    for size in sizes:
+        yield size, family(module, size, random.Random("%s-%d-%d" % (name, size, seed)))
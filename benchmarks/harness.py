@@ -0,0 +1,177 @@
+"""
+Timing (wall time) and peak memory (tracemalloc) measurements, and the
+machine-readable results written and compared between runs.
+"""
+
+import copy
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from foobar import ROOT, load_solver
+
+from benchmarks.families import FAMILIES, generate_inputs
+from benchmarks.instrumentation import instrument
+
+
+def measure(function, inputs, repeat=3, reset=None):
+    """
+    Calls function(*arguments) for every argument tuple of inputs, and returns the
+    best wall times (in seconds) over repeat runs, cold then warm, and the peak
+    memory allocated by a cold run (in bytes, measured in a separate run since
+    tracemalloc slows things down). A cold run starts with a call to reset (if
+    given, e.g. emptying the caches of the solver), and a warm run follows it
+    without one. Arguments are copied before each run, in case the function
+    modifies them.
+    """
+
+    def run(cold):
+        arguments = copy.deepcopy(inputs)
+        if cold and reset is not None:
+            reset()
+        start = time.perf_counter()
+        for argument in arguments:
+            function(*argument)
+        return time.perf_counter() - start
+
+    cold_times = []
+    warm_times = []
+    for _ in range(repeat):
+        cold_times.append(run(cold=True))
+        warm_times.append(run(cold=False))
+
+    arguments = copy.deepcopy(inputs)
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    try:
+        for argument in arguments:
+            function(*argument)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(cold_times), min(warm_times), peak_memory
+
+
+def run_benchmarks(names=None, repeat=3, seed=0, report=print, instrumented=False):
+    """
+    Runs the benchmarks of the given solvers (all of them by default), and
+    returns the results as a JSON-serializable dict. If instrumented, the
+    solvers having hooks (see benchmarks/instrumentation.py) are run once more
+    with a recorder, outside of the measures, and its report is kept as well.
+    Solvers keeping tables between calls have a reset() function, called before
+    every cold run (see measure).
+    """
+    results = []
+    for name in names or sorted(FAMILIES):
+        module = load_solver(name)
+        for size, inputs in generate_inputs(name, module, seed):
+            seconds, warm_seconds, peak_bytes = measure(
+                module.solution, inputs, repeat, getattr(module, "reset", None)
+            )
+            result = {
+                "solver": name,
+                "size": size,
+                "calls": len(inputs),
+                "seconds": seconds,
+                "warm_seconds": warm_seconds,
+                "peak_bytes": peak_bytes,
+            }
+            if instrumented and hasattr(module, "recorder"):
+                with instrument(module) as recorder:
+                    for arguments in copy.deepcopy(inputs):
+                        module.solution(*arguments)
+                result["instrumentation"] = recorder.report()
+            results.append(result)
+            if report is not None:
+                report(
+                    "%-26s size %10d: %10.6fs cold %10.6fs warm  %12d bytes"
+                    % (name, size, seconds, warm_seconds, peak_bytes)
+                )
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+# What a service hosting every solver goes through before its first answer
+STARTUP_STAGES = [
+    ("interpreter", "pass"),
+    ("import", "import foobar"),
+    ("load", "import foobar; [foobar.load_solver(name) for name in foobar.SOLVERS]"),
+    ("warm_up", "import foobar; foobar.warm_up()"),
+]
+
+
+def measure_startup(repeat=5, report=print):
+    """
+    Best wall time (in seconds, over repeat fresh interpreters) of each startup
+    stage, the interpreter itself included.
+    """
+    startup = {}
+    for stage, code in STARTUP_STAGES:
+        best_time = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.check_call([sys.executable, "-c", code], cwd=ROOT)
+            elapsed = time.perf_counter() - start
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+        startup[stage] = best_time
+        if report is not None:
+            report("%-26s startup: %10.6fs" % (stage, best_time))
+    return startup
+
+
+def write_results(results, path):
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+
+
+def read_results(path):
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def compare(baseline, current, threshold=1.25):
+    """
+    Compares two benchmark results (as returned by run_benchmarks), and returns
+    the regressions: (solver, size, metric, baseline value, current value) for
+    every measurement at least threshold times worse than in the baseline.
+    Startup times (if both have them) are reported with "startup" as solver.
+    """
+    baseline_results = {
+        (result["solver"], result["size"]): result for result in baseline["results"]
+    }
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_results.get((result["solver"], result["size"]))
+        if previous is None:
+            continue
+        for metric in ("seconds", "warm_seconds", "peak_bytes"):
+            # Results from before the cold/warm split have no warm_seconds
+            if metric not in previous:
+                continue
+            if result[metric] > threshold * previous[metric]:
+                regressions.append(
+                    (
+                        result["solver"],
+                        result["size"],
+                        metric,
+                        previous[metric],
+                        result[metric],
+                    )
+                )
+    previous_startup = baseline.get("startup", {})
+    for stage, seconds in sorted(current.get("startup", {}).items()):
+        previous = previous_startup.get(stage)
+        if previous is not None and seconds > threshold * previous:
+            regressions.append(("startup", 0, stage, previous, seconds))
+    return regressions
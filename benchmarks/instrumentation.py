@@ -0,0 +1,88 @@
+"""
+Opt-in instrumentation of the solvers: counters, per-phase timers and
+histograms (e.g. frontier sizes), reported through a context manager:
+
+    solver = load_solver("escape-pods")
+    with instrument(solver) as recorder:
+        solver.solution(entrances, exits, matrix)
+    print(recorder.report())
+
+Every instrumented solver has a module-level recorder, None unless a
+Recorder is installed by instrument(), so it costs a global lookup when off.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+import time
+
+from foobar import load_solver
+
+
+class Recorder(object):
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.histograms = defaultdict(list)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def observe(self, name, value):
+        self.histograms[name].append(value)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - start
+
+    def report(self):
+        """
+        Everything recorded so far, as a JSON-serializable dict. Histograms are
+        summarized, with their values counted in power of two buckets.
+        """
+        histograms = {}
+        for name, values in self.histograms.items():
+            buckets = defaultdict(int)
+            for value in values:
+                bucket = 1
+                while bucket < value:
+                    bucket *= 2
+                buckets["<=%d" % bucket] += 1
+            histograms[name] = {
+                "count": len(values),
+                "min": min(values),
+                "max": max(values),
+                "mean": sum(values) / float(len(values)),
+                "buckets": dict(buckets),
+            }
+        return {
+            "counters": dict(self.counters),
+            "timers": dict(self.timers),
+            "histograms": histograms,
+        }
+
+
+@contextmanager
+def instrument(*modules, callback=None):
+    """
+    Installs a Recorder in the given solver modules (or solver names, see
+    load_solver) for the duration of the block, and yields it. If a callback is
+    given, it is called with the report at the end of the block.
+    """
+    modules = [
+        load_solver(module) if isinstance(module, str) else module for module in modules
+    ]
+    recorder = Recorder()
+    previous_recorders = [module.recorder for module in modules]
+    for module in modules:
+        module.recorder = recorder
+    try:
+        yield recorder
+    finally:
+        for module, previous_recorder in zip(modules, previous_recorders):
+            module.recorder = previous_recorder
+        if callback is not None:
+            callback(recorder.report())
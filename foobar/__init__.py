@@ -0,0 +1,93 @@
+"""
+The solutions of every level, behind a single entry point:
+
+    import foobar
+    foobar.solve("escape-pods", [0], [3], matrix)
+
+The scripts have hyphens in their names (e.g. level5/expanding-nebula.py), so
+they can't be imported with a plain import. Instead, each of them is the
+submodule foobar.expanding_nebula, etc., loaded from its path the first time it
+is used (importing foobar itself loads none of them). Solvers with
+expensive tables (e.g. the primes of re-id) build them on their first call and
+keep them warm for the following ones, or ahead of time with warm_up().
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOLVERS = {
+    "re-id": "level1/re-id.py",
+    "elevator-maintenance": "level2.1/elevator-maintenance.py",
+    "bunny-prisoner-locating": "level2.2/bunny-prisoner-locating.py",
+    "fuel-injection-perfection": "level3.1/fuel-injection-perfection.py",
+    "bomb-baby": "level3.2/bomb-baby.py",
+    "doomsday-fuel": "level3.3/doomsday-fuel.py",
+    "free-the-bunny-prisoners": "level4.1/free-the-bunny-prisoners.py",
+    "escape-pods": "level4.2/escape-pods.py",
+    "expanding-nebula": "level5/expanding-nebula.py",
+}
+
+
+class SolverFinder(object):
+    """
+    Import hook (in sys.meta_path) finding the foobar.expanding_nebula, etc.
+    submodules in the scripts of the solvers, so that they can be imported by
+    name like any module, e.g. by the worker processes of multiprocessing
+    unpickling their functions, whatever the start method.
+    """
+
+    def find_spec(self, fullname, path=None, target=None):
+        package, _, attribute = fullname.rpartition(".")
+        name = attribute.replace("_", "-")
+        if package != __name__ or name not in SOLVERS:
+            return None
+        return importlib.util.spec_from_file_location(
+            fullname, os.path.join(ROOT, SOLVERS[name])
+        )
+
+
+if not any(isinstance(finder, SolverFinder) for finder in sys.meta_path):
+    sys.meta_path.append(SolverFinder())
+
+
+def load_solver(name):
+    """
+    Imports the script of the solver (only once) as the foobar.expanding_nebula,
+    etc. submodule, and returns it (see SolverFinder).
+    """
+    if name not in SOLVERS:
+        raise ValueError(
+            "unknown solver %r (choose from %s)" % (name, ", ".join(sorted(SOLVERS)))
+        )
+    return importlib.import_module(__name__ + "." + name.replace("-", "_"))
+
+
+def solve(name, *args):
+    """
+    The answer of the solution() of the given solver, e.g.
+    solve("bomb-baby", "4", "7") == "4".
+    """
+    return load_solver(name).solution(*args)
+
+
+def warm_up(names=None):
+    """
+    Loads the given solvers (all of them by default) and builds their tables now,
+    e.g. before a service starts answering requests.
+    """
+    for name in names or sorted(SOLVERS):
+        module = load_solver(name)
+        if hasattr(module, "warm_up"):
+            module.warm_up()
+
+
+def __getattr__(attribute):
+    # foobar.expanding_nebula loads the solver on first access
+    name = attribute.replace("_", "-")
+    if name in SOLVERS:
+        return load_solver(name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, attribute))
@@ -0,0 +1,33 @@
+"""
+Helpers shared by the scripts of the solvers. A script loaded through foobar
+imports them from here, and keeps a minimal copy of them to run on its own (e.g.
+python level5/expanding-nebula.py, where the foobar package isn't importable).
+"""
+
+from contextlib import nullcontext
+
+# numpy is optional and slow to import, so it is only imported by the first call
+# needing it (see load_numpy), and stays None if it isn't installed
+numpy = None
+numpy_imported = False
+
+
+def load_numpy():
+    global numpy, numpy_imported
+    if not numpy_imported:
+        try:
+            import numpy
+        except ImportError:  # optional, the solvers fall back to pure Python
+            numpy = None
+        numpy_imported = True
+    return numpy
+
+
+def phase(recorder, name):
+    """
+    Context timing a phase of a solver with its recorder (see
+    benchmarks/instrumentation.py), or doing nothing when it is None (off).
+    """
+    if recorder is None:
+        return nullcontext()
+    return recorder.phase(name)
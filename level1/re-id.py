@@ -1,17 +1,144 @@
-def eratosthenes(integers):
-    # recursive implementation of the eratosthenes algorithm
-    if integers[0] ** 2 > integers[-1]:
-        return integers
-    else:
-        return [integers[0]] + eratosthenes(
-            [integer for integer in integers if integer % integers[0] != 0]
-        )
+from array import array
+from bisect import bisect_right
+from itertools import compress
+
+
+def sieve(limit):
+    """
+    Simple sieve of Eratosthenes, returning the primes below limit.
+    """
+    is_prime = bytearray([1]) * max(limit, 2)
+    is_prime[0] = is_prime[1] = 0
+    for integer in range(2, int(limit**0.5) + 1):
+        if is_prime[integer]:
+            is_prime[integer * integer :: integer] = bytearray(
+                len(range(integer * integer, limit, integer))
+            )
+    return list(compress(range(limit), is_prime))
+
+
+class PrimeDigits(object):
+    """
+    The string of all the concatenated primes, without building the string itself.
+    Primes are found with a segmented sieve (extended on demand), and kept in an
+    array. Since primes with the same number of digits are next to each other,
+    we only need to remember where each "number of digits" group starts to find
+    the prime at any digit offset.
+    """
+
+    def __init__(self, segment_size=2**18):
+        self.segment_size = segment_size
+        self.limit = 2  # every prime below limit is known
+        self.primes = array("L")
+        # For each group: first prime index, first digit offset, number of digits
+        self.group_prime_indexes = []
+        self.group_digit_offsets = []
+        self.group_digit_counts = []
+        self.n_digits = 0  # total number of digits
+
+    def extend(self, limit):
+        """
+        Sieves the integers from self.limit up to limit, one segment at a time.
+        """
+        if limit <= self.limit:
+            return
+        base_primes = sieve(int(limit**0.5) + 1)
+        for low in range(self.limit, limit, self.segment_size):
+            high = min(low + self.segment_size, limit)
+            is_prime = bytearray([1]) * (high - low)
+            for prime in base_primes:
+                if prime * prime >= high:
+                    break
+                start = max(prime * prime, (low + prime - 1) // prime * prime)
+                is_prime[start - low :: prime] = bytearray(
+                    len(range(start, high, prime))
+                )
+            self.add_primes(compress(range(low, high), is_prime))
+        self.limit = limit
+
+    def add_primes(self, primes):
+        for prime in primes:
+            n_digits = len(str(prime))
+            if not self.group_digit_counts or self.group_digit_counts[-1] != n_digits:
+                self.group_prime_indexes.append(len(self.primes))
+                self.group_digit_offsets.append(self.n_digits)
+                self.group_digit_counts.append(n_digits)
+            self.primes.append(prime)
+            self.n_digits += n_digits
+
+    def reserve(self, n_digits):
+        """
+        Makes sure that the first n_digits digits are known.
+        """
+        while self.n_digits < n_digits:
+            self.extend(max(2 * self.limit, 1024))
+
+    def digits(self, i, length=5):
+        """
+        The length digits starting at the digit offset i.
+        """
+        self.reserve(i + length)
+        group = bisect_right(self.group_digit_offsets, i) - 1
+        n_digits = self.group_digit_counts[group]
+        prime_index, digit = divmod(i - self.group_digit_offsets[group], n_digits)
+        prime_index += self.group_prime_indexes[group]
+
+        result = str(self.primes[prime_index])[digit:]
+        while len(result) < length:
+            prime_index += 1
+            result += str(self.primes[prime_index])
+        return result[:length]
+
+
+# Built on the first call, and kept for the following ones
+prime_digits = PrimeDigits()
 
 
 def solution(i):
-    prime_numbers = eratosthenes(range(2, 100000))
-    concatenated_prime_numbers_string = "".join(
-        [str(prime_number) for prime_number in prime_numbers]
-    )
-    assert len(concatenated_prime_numbers_string) > 10000
-    return concatenated_prime_numbers_string[i : i + 5]
+    return prime_digits.digits(i, 5)
+
+
+def warm_up(largest_id=10000):
+    """
+    Builds the primes for the ids up to largest_id (the challenge's maximum) ahead
+    of the first call.
+    """
+    prime_digits.reserve(largest_id + 5)
+
+
+def reset():
+    """
+    Forgets the primes built so far, so that the next call starts cold.
+    """
+    global prime_digits
+    prime_digits = PrimeDigits()
+
+
+def batch_solution(ids):
+    """
+    Answers many ids at once, extending the primes only once for the largest id.
+    """
+    ids = list(ids)
+    if ids:
+        prime_digits.reserve(max(ids) + 5)
+    return [prime_digits.digits(i, 5) for i in ids]
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    assert solution(0) == "23571"
+    assert solution(3) == "71113"
+
+    for largest_id in (10000, 10**6, 10**7):
+        ids = [random.randrange(largest_id) for _ in range(10000)]
+        prime_digits = PrimeDigits()
+        for label in ("cold", "warm"):
+            start = time.time()
+            batch_solution(ids)
+            end = time.time()
+            print(
+                "10000 ids up to %8d (%s): took %.4fs"
+                % (largest_id, label, end - start)
+            )
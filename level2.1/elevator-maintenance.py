@@ -1,3 +1,6 @@
+import heapq
+
+
 def partial_order(a, b):
     """
     This function defines a partial order over the versions, recursively
@@ -29,7 +32,7 @@ def partial_order(a, b):
         )
 
 
-def solution(l):
+def selection_sort_solution(l):
     """
     This will sort the list of versions according to a partial order defined above.
     This sort is a recursive selective sort and thus sub-optimal both memory-wise and
@@ -48,4 +51,128 @@ def solution(l):
             max_version = version
             max_version_index = version_index
     l.remove(max_version)
-    return solution(l) + [max_version]
+    return selection_sort_solution(l) + [max_version]
+
+
+def parse_version(version):
+    """
+    Version as a tuple of integers, e.g. "1.0.12" -> (1, 0, 12). Tuples compare
+    the same way as the partial order above: a missing number comes before 0.
+    """
+    return tuple(int(element) for element in version.split("."))
+
+
+def packed_keys(parsed_versions):
+    """
+    Packs every parsed version into a single integer key, with a fixed number of
+    bits per number. Numbers are stored plus one, so that a missing number (0)
+    still comes before an actual 0 (1).
+    """
+    depth = max(len(version) for version in parsed_versions)
+    bits = max(
+        (element + 1).bit_length() for version in parsed_versions for element in version
+    )
+    keys = []
+    for version in parsed_versions:
+        key = 0
+        for element in version:
+            key = (key << bits) | (element + 1)
+        keys.append(key << (bits * (depth - len(version))))
+    return keys
+
+
+def solution(l):
+    """
+    Every version is parsed only once into an integer key (see packed_keys), and
+    the list is sorted with a single key-based sort (the input list is not modified).
+    """
+    if not l:
+        return []
+    keys = packed_keys([parse_version(version) for version in l])
+    order = sorted(range(len(l)), key=keys.__getitem__)
+    return [l[i] for i in order]
+
+
+def iter_sorted_versions(versions, chunk_size=100000):
+    """
+    Sorts a stream of versions (e.g. the lines of a file) with bounded memory:
+    chunks of chunk_size versions are sorted and written to temporary files,
+    which are then merged back together (an external merge sort).
+    Yields the versions in order.
+    """
+    run_files = []
+    try:
+        chunk = []
+        for version in versions:
+            version = version.strip()
+            if version:
+                chunk.append(version)
+            if len(chunk) == chunk_size:
+                run_files.append(write_run(solution(chunk)))
+                chunk = []
+
+        if not run_files:
+            # Everything fits in memory
+            for version in solution(chunk):
+                yield version
+            return
+        if chunk:
+            run_files.append(write_run(solution(chunk)))
+
+        runs = [(line.rstrip("\n") for line in run_file) for run_file in run_files]
+        for version in heapq.merge(*runs, key=parse_version):
+            yield version
+    finally:
+        for run_file in run_files:
+            run_file.close()
+
+
+def write_run(sorted_versions):
+    """
+    Writes a sorted run of versions to a temporary file (deleted once closed),
+    and returns it ready to be read back.
+    """
+    import tempfile  # only needed past the first chunk, and slow to import
+
+    run_file = tempfile.TemporaryFile(mode="w+")
+    run_file.writelines(version + "\n" for version in sorted_versions)
+    run_file.seek(0)
+    return run_file
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    assert solution(["1.11", "2.0.0", "1.2", "2", "0.1", "1.2.1", "1.1.1", "2.0"]) == [
+        "0.1",
+        "1.1.1",
+        "1.2",
+        "1.2.1",
+        "1.11",
+        "2",
+        "2.0",
+        "2.0.0",
+    ]
+
+    def random_version():
+        return ".".join(str(random.randint(0, 20)) for _ in range(random.randint(1, 3)))
+
+    for n_versions in (100, 500, 900, 10**5, 10**6):
+        versions = [random_version() for _ in range(n_versions)]
+        functions = [solution]
+        if n_versions < 1000:  # recursion limit
+            functions.append(selection_sort_solution)
+        for function in functions:
+            start = time.time()
+            function(list(versions))
+            end = time.time()
+            print(
+                "%7d versions, %-23s took %.4fs"
+                % (n_versions, function.__name__, end - start)
+            )
+
+    start = time.time()
+    n_sorted = sum(1 for _ in iter_sorted_versions(iter(versions), chunk_size=10**5))
+    end = time.time()
+    print("%7d versions, iter_sorted_versions    took %.4fs" % (n_sorted, end - start))
@@ -1,7 +1,112 @@
-def solution(x, y):
+from math import isqrt
+
+try:
+    from foobar.support import load_numpy
+except ImportError:  # run on its own, see foobar/support.py
+
+    def load_numpy():
+        try:
+            import numpy
+        except ImportError:
+            return None
+        return numpy
+
+
+def prisoner_id(x, y):
     # moving from (1, 1) to (1, 2) is +1
     # moving from (1, 2) to (2, 3) is +2, etc.
-    moving_up = sum(range(1, y))
-    # once we moved up the first column, we move to the right
-    moving_right = sum(range(y + 1, y + x))
-    return str(1 + moving_up + moving_right)
+    # so moving up the first column is 1 + 2 + ... + (y - 1)
+    # once we moved up the first column, we move to the right:
+    # (y + 1) + (y + 2) + ... + (y + x - 1)
+    # Both sums together are 1 + 2 + ... + (x + y - 2), plus x - 1
+    diagonal = x + y - 1
+    return diagonal * (diagonal - 1) // 2 + x
+
+
+def solution(x, y):
+    return str(prisoner_id(x, y))
+
+
+def prisoner_coordinates(prisoner):
+    """
+    Inverse of prisoner_id: the diagonal of the prisoner is the smallest d such
+    that d * (d + 1) / 2 >= prisoner, which an integer square root gives us.
+    """
+    diagonal = (isqrt(8 * prisoner - 7) + 1) // 2
+    x = prisoner - diagonal * (diagonal - 1) // 2
+    return x, diagonal + 1 - x
+
+
+# Above this, int64 could overflow and float square roots are not exact enough
+MAXIMUM_VECTORIZED_ID = 2**52
+
+
+def vectorized_ids(xs, ys):
+    """
+    prisoner_id for whole arrays of coordinates at once (with NumPy, as a list of
+    ints otherwise or for huge coordinates).
+    """
+    np = load_numpy()
+    if np is not None:
+        try:
+            xs = np.asarray(xs, dtype=np.int64)
+            ys = np.asarray(ys, dtype=np.int64)
+        except OverflowError:
+            pass
+        else:
+            if len(xs) == 0 or (xs + ys).max() < isqrt(2 * MAXIMUM_VECTORIZED_ID):
+                diagonals = xs + ys - 1
+                return diagonals * (diagonals - 1) // 2 + xs
+    return [prisoner_id(int(x), int(y)) for x, y in zip(xs, ys)]
+
+
+def vectorized_coordinates(prisoners):
+    """
+    prisoner_coordinates for a whole array of ids at once, returning the arrays
+    of x and y (with NumPy, as lists of ints otherwise or for huge ids).
+    """
+    np = load_numpy()
+    if np is not None:
+        try:
+            prisoners = np.asarray(prisoners, dtype=np.int64)
+        except OverflowError:
+            pass
+        else:
+            if len(prisoners) == 0 or prisoners.max() < MAXIMUM_VECTORIZED_ID:
+                diagonals = ((np.sqrt(8 * prisoners - 7) + 1) // 2).astype(np.int64)
+                # The float square root can be off by one around perfect squares
+                diagonals -= diagonals * (diagonals - 1) // 2 >= prisoners
+                diagonals += diagonals * (diagonals + 1) // 2 < prisoners
+                xs = prisoners - diagonals * (diagonals - 1) // 2
+                return xs, diagonals + 1 - xs
+    coordinates = [prisoner_coordinates(int(prisoner)) for prisoner in prisoners]
+    return [x for x, _ in coordinates], [y for _, y in coordinates]
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    assert solution(3, 2) == "9"
+    assert solution(5, 10) == "96"
+
+    n_coordinates = 10**6
+    xs = [random.randint(1, 10**6) for _ in range(n_coordinates)]
+    ys = [random.randint(1, 10**6) for _ in range(n_coordinates)]
+
+    start = time.time()
+    ids = [solution(x, y) for x, y in zip(xs, ys)]
+    end = time.time()
+    print("%d coordinates, solution took %.4fs" % (n_coordinates, end - start))
+
+    start = time.time()
+    vectorized = vectorized_ids(xs, ys)
+    end = time.time()
+    print("%d coordinates, vectorized_ids took %.4fs" % (n_coordinates, end - start))
+    assert [str(prisoner) for prisoner in vectorized] == ids
+
+    start = time.time()
+    coordinates = vectorized_coordinates(vectorized)
+    end = time.time()
+    print("%d ids, vectorized_coordinates took %.4fs" % (n_coordinates, end - start))
+    assert list(coordinates[0]) == xs and list(coordinates[1]) == ys
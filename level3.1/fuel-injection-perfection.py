@@ -1,4 +1,4 @@
-def solution(i):
+def stepwise_solution(i):
     """
     Fastest way to go down to 1 is as follows:
     Divide by 2 if the number is even.
@@ -14,7 +14,7 @@ def solution(i):
     i = int(i)
     while i != 1:
         if i % 2 == 0:
-            i = i / 2
+            i = i // 2
         else:
             if (i - 1) % 4 == 0 or i == 3:
                 i = i - 1
@@ -22,3 +22,118 @@ def solution(i):
                 i = i + 1
         number_of_operations += 1
     return str(number_of_operations)
+
+
+def parse_decimal(digits):
+    """
+    int() of a decimal string, even longer than the limit of Python's conversion
+    (4300 digits since Python 3.11), by converting its two halves separately.
+    """
+    if len(digits) <= 4000:
+        return int(digits)
+    half = len(digits) // 2
+    return parse_decimal(digits[:-half]) * 10**half + parse_decimal(digits[-half:])
+
+
+def count_operations(n):
+    """
+    Same rules as stepwise_solution, on the bits of the integer n, but a whole run
+    of bits at a time: a run of trailing zeros is as many divisions by 2, and for
+    a number ending with a run of ones (11), adding 1 turns the whole run into
+    zeros. We never leave the integers, so there is no float precision issue.
+    """
+    operations = 0
+    while n > 3:
+        if n & 1 == 0:
+            trailing_zeros = (n & -n).bit_length() - 1
+            n >>= trailing_zeros
+            operations += trailing_zeros
+        elif n & 2 == 0:  # ends with 01
+            n -= 1
+            operations += 1
+        else:  # ends with 11
+            n += 1
+            trailing_zeros = (n & -n).bit_length() - 1
+            n >>= trailing_zeros
+            operations += 1 + trailing_zeros
+    # 3 -> 2 -> 1, 2 -> 1, 1
+    return operations + n - 1
+
+
+def count_operations_by_runs(n):
+    """
+    Same as count_operations, scanning the binary string of n once from its least
+    significant bit (count_operations shifts the whole integer at every step).
+    carry is the 1 left over by adding 1 to a number ending with 11:
+    - a run of zeros (without carry) is as many divisions by 2
+    - a run of ones with a carry is turned into zeros, and divided as well
+    - otherwise, the number is odd, and the next bit tells us if it ends with 01
+      (remove 1, no carry) or 11 (add 1, carry), before dividing by 2
+    """
+    bits = bin(n)[:1:-1]  # least significant bit first
+    top = len(bits) - 1
+    operations = 0
+    position = 0
+    carry = 0
+    # As long as there are at least 3 more bits above, the number is bigger than 3
+    while position < top - 2:
+        bit = bits[position]
+        if bit == "0" and not carry:
+            end = bits.find("1", position)
+            operations += end - position
+            position = end
+        elif bit == "1" and carry:
+            end = bits.find("0", position)
+            if end < 0:
+                end = len(bits)
+            operations += end - position
+            position = end
+        else:
+            carry = int(bits[position + 1])
+            operations += 2
+            position += 1
+
+    n = int(bits[position:][::-1] or "0", 2) + carry
+    return operations + count_operations(n)
+
+
+def solution(i):
+    return str(count_operations_by_runs(parse_decimal(str(i))))
+
+
+def batch_solution(numbers):
+    """
+    Answers for a list of decimal strings.
+    """
+    return [solution(number) for number in numbers]
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    assert solution("15") == "5"
+    assert solution("4") == "2"
+
+    for n_digits in (10, 100, 1000, 10000):
+        numbers = [
+            str(random.randint(1, 9))
+            + "".join(random.choice("0123456789") for _ in range(n_digits - 1))
+            for _ in range(100)
+        ]
+        start = time.time()
+        answers = batch_solution(numbers)
+        end = time.time()
+        print(
+            "100 numbers of %5d digits, batch_solution took %.4fs"
+            % (n_digits, end - start)
+        )
+
+        if n_digits <= 1000:
+            start = time.time()
+            assert answers == [stepwise_solution(number) for number in numbers]
+            end = time.time()
+            print(
+                "100 numbers of %5d digits, stepwise_solution took %.4fs"
+                % (n_digits, end - start)
+            )
@@ -24,5 +24,115 @@ def recursive_solution(x, y, counter):
         return recursive_solution(smallest, biggest % smallest, counter)
 
 
+def generations(x, y):
+    """
+    Iterative version of recursive_solution, on integers only: returns the number
+    of generations as an int, or None if it is impossible.
+    """
+    counter = 0
+    while x != 1 and y != 1:
+        biggest, smallest = max(x, y), min(x, y)
+        quotient, remainder = divmod(biggest, smallest)
+        if remainder == 0:
+            return None
+        counter += quotient
+        x, y = smallest, remainder
+
+    # if one of the two terms is 1, the path length is the other term minus one
+    return counter + max(x, y) - 1
+
+
 def solution(x, y):
-    return recursive_solution(x, y, 0)
+    result = generations(int(x), int(y))
+    if result is None:
+        return "impossible"
+    return str(result)
+
+
+def parse_decimal(digits):
+    """
+    int() of a decimal string, even longer than the limit of Python's conversion
+    (4300 digits since Python 3.11), by converting its two halves separately.
+    """
+    if len(digits) <= 4000:
+        return int(digits)
+    half = len(digits) // 2
+    return parse_decimal(digits[:-half]) * 10**half + parse_decimal(digits[-half:])
+
+
+def batch_solution(pairs):
+    """
+    Generation counts (None when impossible) for many (M, F) pairs, given as
+    integers or decimal strings. Each distinct string is only parsed once.
+    """
+    parsed = {}
+
+    def parse(number):
+        if isinstance(number, int):
+            return number
+        if number not in parsed:
+            parsed[number] = parse_decimal(number)
+        return parsed[number]
+
+    return [generations(parse(x), parse(y)) for x, y in pairs]
+
+
+def stream_solution(lines):
+    """
+    Generation counts (None when impossible) for a stream of "M F" lines, e.g.
+    the lines of a file, yielded one by one.
+    """
+    for line in lines:
+        fields = line.split()
+        if fields:
+            yield generations(parse_decimal(fields[0]), parse_decimal(fields[1]))
+
+
+if __name__ == "__main__":
+    import time
+
+    def to_decimal(n):
+        # str() of an int has the same limit as int() of a string
+        if n < 10**4000:
+            return str(n)
+        half = int(n.bit_length() * 0.30103) // 2  # half of the digits
+        high, low = divmod(n, 10**half)
+        return to_decimal(high) + to_decimal(low).zfill(half)
+
+    assert solution("2", "1") == "1"
+    assert solution("4", "7") == "4"
+    assert solution("2", "4") == "impossible"
+
+    # Consecutive Fibonacci numbers are the worst case: every quotient is 1, so
+    # there are as many steps as generations
+    fibonacci = [1, 1]
+    while len(fibonacci) < 21000:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+
+    for k in (100, 500, 2000, 21000):
+        pairs = [(to_decimal(fibonacci[k - 1]), to_decimal(fibonacci[k - 2]))] * 100
+        start = time.time()
+        answers = batch_solution(pairs)
+        end = time.time()
+        assert answers == [k - 2] * 100
+        print(
+            "100 Fibonacci pairs, %5d generations: batch_solution took %.4fs"
+            % (k - 2, end - start)
+        )
+
+        if k <= 500:  # recursion limit
+            start = time.time()
+            for x, y in pairs:
+                assert recursive_solution(x, y, 0) == str(k - 2)
+            end = time.time()
+            print(
+                "100 Fibonacci pairs, %5d generations: recursive_solution took %.4fs"
+                % (k - 2, end - start)
+            )
+
+    lines = ["%d %d\n" % (fibonacci[k - 1], fibonacci[k - 2]) for k in range(3, 2000)]
+    lines.append("%s %s\n" % (to_decimal(fibonacci[-1]), to_decimal(fibonacci[-2])))
+    start = time.time()
+    assert list(stream_solution(lines)) == list(range(1, 1998)) + [20998]
+    end = time.time()
+    print("%d lines, stream_solution took %.4fs" % (len(lines), end - start))
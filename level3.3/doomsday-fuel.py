@@ -1,10 +1,33 @@
-from fractions import Fraction, gcd
-import math
+from contextlib import nullcontext
+from fractions import Fraction
+from math import gcd
+from numbers import Rational
+
+try:
+    from foobar.support import load_numpy, phase
+except ImportError:  # run on its own, see foobar/support.py
+
+    def load_numpy():
+        try:
+            import numpy
+        except ImportError:
+            return None
+        return numpy
+
+    def phase(recorder, name):
+        if recorder is None:
+            return nullcontext()
+        return recorder.phase(name)
+
+
+# Opt-in instrumentation, see benchmarks/instrumentation.py (None when off)
+recorder = None
+
 
 # Matrix operations functions inspired from
 # https://stackoverflow.com/questions/32114054/matrix-inversion-without-numpy
 def transpose_matrix(matrix):
-    return map(list, zip(*matrix))
+    return list(map(list, zip(*matrix)))
 
 
 def get_matrix_minor(matrix, i, j):
@@ -77,7 +100,7 @@ def lcm_on_a_list(l):
     return lcm_on_a_list([lcm(l[0], l[1])] + l[2:])
 
 
-def solution(matrix):
+def cofactor_solution(matrix):
     """
     matrix is a squre matrix of form (for example)
     [
@@ -172,3 +195,653 @@ def solution(matrix):
         lcm_denominator
     ]
     return answer
+
+
+def solve_fraction_free(a, b):
+    """
+    Solves the linear system a.x = b exactly, for a square integer matrix a and an
+    integer vector b, with the fraction-free elimination of Bareiss: every division
+    in the elimination is exact, so we only ever handle integers (no Fraction, and
+    no factorial blow-up like with the cofactor expansion).
+    Returns (numerators, denominator) such that x[i] = numerators[i] / denominator.
+    """
+    (numerators,), determinant = solve_fraction_free_columns(a, [b])
+    return numerators, determinant
+
+
+def solve_fraction_free_columns(a, columns):
+    """
+    Same as solve_fraction_free, for several right-hand side vectors (columns)
+    sharing the same elimination. Returns the numerators of each solution, and
+    their common denominator.
+    """
+    n = len(a)
+    if recorder is not None:
+        recorder.observe("system_size", n)
+    rows = [list(a[i]) + [column[i] for column in columns] for i in range(n)]
+    previous_pivot = 1
+    for k in range(n):
+        # We need a non-zero pivot, swapping rows doesn't change the solution
+        pivot_index = k
+        while rows[pivot_index][k] == 0:
+            pivot_index += 1
+            if pivot_index == n:
+                raise ValueError("singular system (some states can't be absorbed)")
+        if pivot_index != k:
+            rows[k], rows[pivot_index] = rows[pivot_index], rows[k]
+            if recorder is not None:
+                recorder.count("pivot_swaps")
+
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        if recorder is not None:
+            recorder.count("row_operations", n - k - 1)
+        for row in rows[k + 1 :]:
+            factor = row[k]
+            row[k:] = [
+                (pivot * element - factor * pivot_element) // previous_pivot
+                for element, pivot_element in zip(row[k:], pivot_row[k:])
+            ]
+        previous_pivot = pivot
+
+    # The last pivot is the determinant of a, and with Cramer's rule every
+    # determinant * x[i] is an integer, so the back-substitution divisions are exact
+    determinant = previous_pivot
+    solutions = []
+    for c in range(n, n + len(columns)):
+        numerators = [0] * n
+        for i in range(n - 1, -1, -1):
+            row = rows[i]
+            numerators[i] = (
+                determinant * row[c]
+                - sum(row[j] * numerators[j] for j in range(i + 1, n))
+            ) // row[i]
+        solutions.append(numerators)
+    return solutions, determinant
+
+
+def to_answer(numerators, denominator):
+    """
+    Puts the fractions numerators[j] / denominator to the same (least) denominator,
+    which is simply dividing everything by their common gcd, and returns them in the
+    [numerators..., denominator] answer format.
+    """
+    common_divisor = abs(denominator)
+    for numerator in numerators:
+        common_divisor = gcd(common_divisor, numerator)
+    if denominator < 0:
+        common_divisor = -common_divisor
+    return [numerator // common_divisor for numerator in numerators] + [
+        denominator // common_divisor
+    ]
+
+
+def solution(matrix):
+    """
+    Same answer as cofactor_solution, without forming the inverse of (I - Q).
+    Scaling each transient row by its sum, (I - Q) becomes the integer matrix
+    a = diag(row sums) - (transient to transient counts), and the absorption
+    probabilities are x = a^-1.c, with c the transient to terminal counts.
+    We only need the row of s0, which is y.c where y solves transpose(a).y = e0.
+    """
+    terminal_states = [i for i, row in enumerate(matrix) if sum(row) == 0]
+    transient_states = [i for i, row in enumerate(matrix) if sum(row) != 0]
+
+    # edge case, where the starting state is a terminal state
+    if sum(matrix[0]) == 0:
+        return [1, 1]
+
+    with phase(recorder, "build_system"):
+        transposed_a = [
+            [(sum(matrix[i]) if i == j else 0) - matrix[j][i] for j in transient_states]
+            for i in transient_states
+        ]
+    e0 = [1] + [0] * (len(transient_states) - 1)
+    with phase(recorder, "elimination"):
+        y_numerators, denominator = solve_fraction_free(transposed_a, e0)
+
+    numerators = [
+        sum(
+            y_numerator * matrix[i][j]
+            for y_numerator, i in zip(y_numerators, transient_states)
+        )
+        for j in terminal_states
+    ]
+
+    return to_answer(numerators, denominator)
+
+
+def matrix_to_graph(matrix):
+    """
+    Adjacency-list version of an input matrix: graph[i] is the list of the
+    (j, count) pairs for the non-zero counts of the row i.
+    """
+    return [[(j, count) for j, count in enumerate(row) if count] for row in matrix]
+
+
+def strongly_connected_components(graph, start=0):
+    """
+    Iterative Tarjan algorithm over the states reachable from start (the others are
+    never visited). The components are returned in reverse topological order, i.e.
+    a component comes after every component it can lead to.
+    """
+    index_of = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    index_of[start] = lowlink[start] = 0
+    stack.append(start)
+    on_stack.add(start)
+    work = [(start, iter(graph[start]))]
+    while work:
+        state, edges = work[-1]
+        for target, count in edges:
+            if not count:
+                continue
+            if target not in index_of:
+                index_of[target] = lowlink[target] = len(index_of)
+                stack.append(target)
+                on_stack.add(target)
+                work.append((target, iter(graph[target])))
+                break
+            elif target in on_stack:
+                lowlink[state] = min(lowlink[state], index_of[target])
+        else:
+            # Every successor of state has been explored
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[state])
+            if lowlink[state] == index_of[state]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.remove(member)
+                    component.append(member)
+                    if member == state:
+                        break
+                components.append(component)
+    return components
+
+
+def sparse_solution(graph):
+    """
+    Same answer as solution, for an adjacency-list input (see matrix_to_graph).
+    As in solution(), we solve transpose(a).y = e0, where y is the (scaled)
+    probability flow going out of s0. Only the states reachable from s0 are kept,
+    and they are split into strongly connected components: going through the
+    components in topological order, the flow entering a component only depends
+    on the components before it, so we solve one small exact system per component
+    instead of the whole dense one. The flow entering a terminal state is the
+    probability of ending there.
+    """
+    terminal_states = [
+        i for i, edges in enumerate(graph) if not any(count for _, count in edges)
+    ]
+
+    # edge case, where the starting state is a terminal state
+    if not any(count for _, count in graph[0]):
+        return [1, 1]
+
+    with phase(recorder, "components"):
+        components = strongly_connected_components(graph)
+    inflows = {0: Fraction(1)}
+    for component in reversed(components):
+        if len(component) == 1 and not any(count for _, count in graph[component[0]]):
+            continue  # terminal state, its inflow is its probability
+
+        if recorder is not None:
+            recorder.observe("component_size", len(component))
+
+        # transpose(a) restricted to the component, and the flow entering it
+        position = {state: k for k, state in enumerate(component)}
+        transposed_a = [[0] * len(component) for _ in component]
+        scale = 1
+        for k, state in enumerate(component):
+            for target, count in graph[state]:
+                transposed_a[k][k] += count
+                if target in position:
+                    transposed_a[position[target]][k] -= count
+            scale = lcm(scale, inflows.get(state, Fraction(0)).denominator)
+        y_numerators, denominator = solve_fraction_free(
+            transposed_a,
+            [int(inflows.pop(state, 0) * scale) for state in component],
+        )
+
+        # Pushing the flow out of the component
+        for y_numerator, state in zip(y_numerators, component):
+            if not y_numerator:
+                continue
+            y = Fraction(y_numerator, denominator * scale)
+            for target, count in graph[state]:
+                if count and target not in position:
+                    inflows[target] = inflows.get(target, 0) + count * y
+
+    denominator = 1
+    for terminal in terminal_states:
+        denominator = lcm(denominator, inflows.get(terminal, Fraction(0)).denominator)
+    return to_answer(
+        [int(inflows.get(terminal, 0) * denominator) for terminal in terminal_states],
+        denominator,
+    )
+
+
+# Floats can only represent integers exactly up to 2^53
+MAXIMUM_FLOAT_DENOMINATOR = 2**50
+
+# The integer check of the rebuilt fractions is done with int64 products, as long
+# as they can't overflow
+MAXIMUM_INT64_PRODUCT = 2**62
+
+
+# Below that many states, solution() takes less time than the NumPy calls alone
+MINIMUM_FLOAT_STATES = 14
+
+
+def float_denominator_fits(matrix):
+    """
+    Whether the denominator rebuilt from the floating point solution is sure to be
+    at most MAXIMUM_FLOAT_DENOMINATOR (see batch_float_solution for the bound).
+    """
+    bound = 1
+    for i, row in enumerate(matrix):
+        row_sum = sum(row)
+        if row_sum:
+            bound *= row_sum - row[i]
+            if bound > MAXIMUM_FLOAT_DENOMINATOR:
+                return False
+    return True
+
+
+def float_solution(matrix):
+    """
+    Same answer as solution, solving the system in floating point with NumPy and
+    rebuilding the exact fractions afterwards (see batch_float_solution), when
+    that can be faster: for small matrices, or denominators that may be too big
+    for floats, this is solution().
+    """
+    if len(matrix) < MINIMUM_FLOAT_STATES or not float_denominator_fits(matrix):
+        return solution(matrix)
+    return batch_float_solution([matrix])[0]
+
+
+def batch_float_solution(matrices):
+    """
+    Same answers as solution for a batch of input matrices of the same size,
+    stacked and solved in floating point with vectorized NumPy calls.
+    Each matrix gives the integer matrix a over all the states: transient rows
+    scaled by their sum as in solution(), and terminal rows of the identity, so
+    that the z solving transpose(a).z = e0 holds the probability of ending in each
+    terminal state. By Cramer's rule, determinant(a) * z is made of integers, so we
+    only need to round them, and check them against the integer systems.
+    determinant(a) is the one of the transient rows and columns, a diagonally
+    dominant matrix with no positive element off its diagonal: by Hadamard's
+    inequality for such matrices, it is at most the product of the diagonal. The
+    matrices where that bound is too big for floats, or where the check fails, are
+    solved exactly, as well as all of them without NumPy.
+    """
+    np = load_numpy()
+    if np is None:
+        return [solution(matrix) for matrix in matrices]
+
+    counts = np.array(matrices, dtype=np.int64)
+    n_matrices, n_states, _ = counts.shape
+    row_sums = counts.sum(axis=2)
+    terminal = row_sums == 0
+    diagonal = np.arange(n_states)
+    bounds = np.where(terminal, 1, row_sums - counts[:, diagonal, diagonal])
+    candidates = ~terminal[:, 0] & (
+        bounds.astype(float).prod(axis=1) <= MAXIMUM_FLOAT_DENOMINATOR
+    )
+
+    answers = [[1, 1] if terminal[k, 0] else None for k in range(n_matrices)]
+    indexes = np.flatnonzero(candidates)
+    if len(indexes):
+        terminal = terminal[indexes]
+        a = -counts[indexes]
+        a[:, diagonal, diagonal] += row_sums[indexes]
+        a[terminal] = np.eye(n_states, dtype=np.int64)[np.nonzero(terminal)[1]]
+
+        systems = a.transpose(0, 2, 1).astype(float)
+        e0 = np.zeros((len(indexes), n_states, 1))
+        e0[:, 0, 0] = 1
+        try:
+            zs = np.linalg.solve(systems, e0)[:, :, 0]
+            determinants = np.rint(np.abs(np.linalg.det(systems)))
+        except np.linalg.LinAlgError:
+            # One of the systems is singular, let's solve them all exactly
+            zs = None
+        if zs is not None:
+            numerators = np.rint(zs * determinants[:, None])
+            valid = (
+                (determinants > 0)
+                & (determinants <= MAXIMUM_FLOAT_DENOMINATOR)
+                & (
+                    np.abs(numerators).max(axis=1) * np.abs(a).sum(axis=1).max(axis=1)
+                    < MAXIMUM_INT64_PRODUCT
+                )
+            )
+            numerators = np.where(valid[:, None], numerators, 0).astype(np.int64)
+            denominators = np.where(valid, determinants, 1).astype(np.int64)
+
+            # Checking transpose(a).numerators = denominator * e0, in integers
+            products = np.einsum("kji,kj->ki", a, numerators)
+            products[:, 0] -= denominators
+            valid &= ~products.any(axis=1)
+
+            # Reduced fractions, as in to_answer
+            divisors = np.gcd.reduce(
+                np.where(terminal, numerators, 0), axis=1, initial=0
+            )
+            divisors = np.gcd(divisors, denominators)
+            numerators //= divisors[:, None]
+            denominators //= divisors
+            for k, index in enumerate(indexes.tolist()):
+                if valid[k]:
+                    answers[index] = numerators[k][terminal[k]].tolist() + [
+                        int(denominators[k])
+                    ]
+
+    return [
+        answer if answer is not None else solution(matrix)
+        for answer, matrix in zip(answers, matrices)
+    ]
+
+
+class AbsorbingChain(object):
+    """
+    Absorption probabilities and expected number of steps before absorption, for
+    any start state or starting distribution of an input matrix.
+    Scaling each transient row by its sum, (I - Q) becomes the integer matrix a
+    (see solution), the absorption probabilities from every transient state are
+    a^-1.c (c the transient to terminal counts), and the expected numbers of
+    steps are a^-1.s (s the row sums, since N.1 = a^-1.diag(s).1). Both are
+    found with a single fraction-free elimination of a, with all these columns
+    as right-hand sides, after which a query is a weighted sum of the rows of its
+    start states.
+    """
+
+    def __init__(self, matrix):
+        self.n_states = len(matrix)
+        self.terminal_states = [i for i, row in enumerate(matrix) if sum(row) == 0]
+        self.transient_states = [i for i, row in enumerate(matrix) if sum(row) != 0]
+        self.transient_positions = {
+            state: k for k, state in enumerate(self.transient_states)
+        }
+        self.terminal_positions = {
+            state: k for k, state in enumerate(self.terminal_states)
+        }
+
+        # absorption_numerators[k][t] / denominator is the probability of ending
+        # in the terminal state t when starting from the transient state k, and
+        # step_numerators[k] / denominator the expected number of steps
+        self.absorption_numerators = []
+        self.step_numerators = []
+        self.denominator = 1
+        if self.transient_states:
+            a = [
+                [
+                    (sum(matrix[i]) if i == j else 0) - matrix[i][j]
+                    for j in self.transient_states
+                ]
+                for i in self.transient_states
+            ]
+            columns = [
+                [matrix[i][j] for i in self.transient_states]
+                for j in self.terminal_states
+            ]
+            columns.append([sum(matrix[i]) for i in self.transient_states])
+            solutions, self.denominator = solve_fraction_free_columns(a, columns)
+            self.absorption_numerators = [list(row) for row in zip(*solutions[:-1])]
+            self.step_numerators = solutions[-1]
+
+    def start_weights(self, start):
+        """
+        (state, weight) pairs of a start state (its index) or of a starting
+        distribution (a weight for every state, normalized by their sum), and the
+        sum of the weights. The weights must be exact (ints or Fractions), and are
+        scaled to integers by the lcm of their denominators.
+        """
+        if isinstance(start, int):
+            return [(start, 1)], 1
+        if len(start) != self.n_states:
+            raise ValueError(
+                "a distribution needs a weight for each of the %d states"
+                % self.n_states
+            )
+        weights = [(state, weight) for state, weight in enumerate(start) if weight]
+        multiple = 1
+        for _, weight in weights:
+            if not isinstance(weight, Rational):
+                raise ValueError(
+                    "the weights of a distribution must be ints or Fractions, not %r"
+                    % (weight,)
+                )
+            multiple = lcm(multiple, weight.denominator)
+        weights = [(state, int(weight * multiple)) for state, weight in weights]
+        total = sum(weight for _, weight in weights)
+        if total <= 0:
+            raise ValueError("the weights of a distribution must sum up to more than 0")
+        return weights, total
+
+    def probabilities(self, start):
+        """
+        Exact probabilities (Fractions) of ending in each terminal state, in the
+        order of the terminal states.
+        """
+        numerators, denominator = self.absorption_fractions(start)
+        return [Fraction(numerator, denominator) for numerator in numerators]
+
+    def absorption_fractions(self, start):
+        """
+        Numerators of the probabilities of ending in each terminal state, and
+        their common denominator.
+        """
+        weights, total = self.start_weights(start)
+        numerators = [0] * len(self.terminal_states)
+        for state, weight in weights:
+            if state in self.terminal_positions:
+                numerators[self.terminal_positions[state]] += weight * self.denominator
+            else:
+                row = self.absorption_numerators[self.transient_positions[state]]
+                for t, numerator in enumerate(row):
+                    numerators[t] += weight * numerator
+        return numerators, self.denominator * total
+
+    def expected_steps(self, start):
+        """
+        Exact expected number of steps (a Fraction) before ending in a terminal
+        state (0 when starting from one).
+        """
+        weights, total = self.start_weights(start)
+        numerator = sum(
+            weight * self.step_numerators[self.transient_positions[state]]
+            for state, weight in weights
+            if state in self.transient_positions
+        )
+        return Fraction(numerator, self.denominator * total)
+
+    def answer(self, start):
+        """
+        Probabilities in the same [numerators..., denominator] format as solution
+        (from a terminal start state too, where solution returns [1, 1]).
+        """
+        return to_answer(*self.absorption_fractions(start))
+
+
+def batch_solution(matrix, starts):
+    """
+    Answers (see AbsorbingChain.answer) for many start states or distributions
+    of the same input matrix, sharing a single elimination.
+    """
+    chain = AbsorbingChain(matrix)
+    return [chain.answer(start) for start in starts]
+
+
+def random_absorbing_chain(n_transient, n_terminal, randomizer, n_edges=None):
+    """
+    Random input matrix with n_transient states (s0 first) that all end up in
+    one of the n_terminal terminal states. Every transition is possible, unless
+    n_edges is given (then each transient state only has about n_edges + 1).
+    """
+    n_states = n_transient + n_terminal
+    # s0 stays first, the terminal states are shuffled between the transient ones
+    order = [0] + randomizer.sample(range(1, n_states), n_states - 1)
+    matrix = []
+    for state in order:
+        row = [0] * n_states
+        if state < n_transient:
+            if n_edges is None:
+                row = [randomizer.randint(0, 9) for _ in range(n_states)]
+            else:
+                for _ in range(n_edges):
+                    row[randomizer.randrange(n_states)] = randomizer.randint(1, 9)
+            row[n_transient + randomizer.randrange(n_terminal)] += 1
+        matrix.append([row[j] for j in order])
+    return matrix
+
+
+def random_sparse_graph(n_states, randomizer):
+    """
+    Random adjacency-list input with a few edges per state, going mostly forward
+    (so that the strongly connected components stay small), where one state out
+    of ten is terminal.
+    """
+    graph = []
+    for i in range(n_states):
+        if i % 10 == 9 or i == n_states - 1:
+            graph.append([])
+            continue
+        targets = set(
+            min(n_states - 1, max(0, i + randomizer.randint(-3, 20))) for _ in range(3)
+        )
+        targets.add(min(n_states - 1, i + 10 - i % 10 + 9))  # a terminal state
+        graph.append([(j, randomizer.randint(1, 9)) for j in sorted(targets)])
+    return graph
+
+
+if __name__ == "__main__":
+    import copy
+    import random
+    import time
+
+    assert solution(
+        [
+            [0, 2, 1, 0, 0],
+            [0, 0, 0, 3, 4],
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+        ]
+    ) == [7, 6, 8, 21]
+    assert solution(
+        [
+            [0, 1, 0, 0, 0, 1],
+            [4, 0, 0, 3, 2, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+        ]
+    ) == [0, 3, 2, 9, 14]
+
+    randomizer = random.Random(0)
+    for n_transient in (3, 5, 7, 8, 25, 50, 100, 200):
+        matrix = random_absorbing_chain(n_transient, 4, randomizer)
+        functions = [solution]
+        if n_transient <= 8:
+            functions.append(cofactor_solution)
+        answers = []
+        for function in functions:
+            start = time.time()
+            answers.append(function(copy.deepcopy(matrix)))
+            end = time.time()
+            print(
+                "%3d transient states, %-17s took %.4fs"
+                % (n_transient, function.__name__, end - start)
+            )
+        assert all(answer == answers[0] for answer in answers)
+
+    for n_states in (100, 200, 1000, 4000):
+        graph = random_sparse_graph(n_states, randomizer)
+        start = time.time()
+        answer = sparse_solution(graph)
+        end = time.time()
+        print("%5d states, sparse_solution   took %.4fs" % (n_states, end - start))
+        if n_states <= 200:
+            matrix = [[0] * n_states for _ in range(n_states)]
+            for i, edges in enumerate(graph):
+                for j, count in edges:
+                    matrix[i][j] = count
+            start = time.time()
+            assert solution(matrix) == answer
+            end = time.time()
+            print("%5d states, solution          took %.4fs" % (n_states, end - start))
+
+    n_batch = 1000
+    load_numpy()  # not in the timings
+    for n_transient in (5, 10, 15):
+        # Sparse chains, where the denominators stay small enough for floats
+        matrices = [
+            random_absorbing_chain(n_transient, 4, randomizer, n_edges=2)
+            for _ in range(n_batch)
+        ]
+        for label, solve_batch in (
+            ("solution", lambda: [solution(matrix) for matrix in matrices]),
+            ("float_solution", lambda: [float_solution(m) for m in matrices]),
+            ("batch_float_solution", lambda: batch_float_solution(matrices)),
+        ):
+            start = time.time()
+            answers = solve_batch()
+            end = time.time()
+            print(
+                "%d chains of %2d transient states, %-20s took %.4fs"
+                % (n_batch, n_transient, label, end - start)
+            )
+
+    # Every start state of the same chain, solving again from each of them (with
+    # the start state moved first) vs a single AbsorbingChain
+    matrix = random_absorbing_chain(50, 4, randomizer)
+    n_states = len(matrix)
+    start = time.time()
+    answers = []
+    for state in range(n_states):
+        if sum(matrix[state]) == 0:
+            continue
+        order = [state] + [i for i in range(n_states) if i != state]
+        answers.append(solution([[matrix[i][j] for j in order] for i in order]))
+    end = time.time()
+    print("%d start states, solution each time took %.4fs" % (n_states, end - start))
+    start = time.time()
+    chain = AbsorbingChain(matrix)
+    chain_answers = [chain.answer(state) for state in chain.transient_states]
+    steps = [chain.expected_steps(state) for state in chain.transient_states]
+    end = time.time()
+    print("%d start states, AbsorbingChain took %.4fs" % (n_states, end - start))
+    assert chain_answers == answers
+
+    # The expected steps t solve (I - Q).t = 1, which we solve again here with
+    # Fractions and a plain Gauss-Jordan elimination
+    transient_states = chain.transient_states
+    system = [
+        [
+            Fraction(int(i == j)) - Fraction(matrix[i][j], sum(matrix[i]))
+            for j in transient_states
+        ]
+        + [Fraction(1)]
+        for i in transient_states
+    ]
+    for k in range(len(system)):
+        pivot_index = next(i for i in range(k, len(system)) if system[i][k] != 0)
+        system[k], system[pivot_index] = system[pivot_index], system[k]
+        system[k] = [element / system[k][k] for element in system[k]]
+        for i, row in enumerate(system):
+            if i != k and row[k] != 0:
+                factor = row[k]
+                system[i] = [
+                    element - factor * pivot_element
+                    for element, pivot_element in zip(row, system[k])
+                ]
+    assert steps == [row[-1] for row in system]
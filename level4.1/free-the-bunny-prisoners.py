@@ -1,10 +1,171 @@
+from array import array
 import itertools
 
 
-def solution(n_bunnies, n_required):
+def binomial(n, k):
+    """
+    Number of combinations of k elements among n (0 if there are none).
+    """
+    if k < 0 or k > n:
+        return 0
+    k = min(k, n - k)
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+def count_keys(n_bunnies, n_required):
     # We know that n_required - 1 bunnies should not be able to open the door with the keys,
-    # which gives us the number of keys
-    n_keys = len(list(itertools.combinations(range(n_bunnies), n_required - 1)))
+    # which gives us the number of keys: one per group of n_required - 1 bunnies
+    return binomial(n_bunnies, n_required - 1)
+
+
+def key_holders(n_bunnies, n_required, key):
+    """
+    Bunnies holding the given key: the key-th (in lexicographic order) group of
+    n_bunnies - n_required + 1 bunnies, found by combinatorial unranking.
+    """
+    n_bunnies_per_key = n_bunnies - n_required + 1
+    holders = []
+    bunny = 0
+    for position in range(n_bunnies_per_key):
+        # Skip the groups where this position holds a smaller bunny
+        while True:
+            n_groups = binomial(n_bunnies - bunny - 1, n_bunnies_per_key - position - 1)
+            if key < n_groups:
+                break
+            key -= n_groups
+            bunny += 1
+        holders.append(bunny)
+        bunny += 1
+    return holders
+
+
+def key_index(n_bunnies, n_required, holders):
+    """
+    Inverse of key_holders: the key given to the (sorted) group of bunnies holders.
+    The number of groups starting with the same bunnies as holders up to some
+    position, but a smaller bunny at that position, is a difference of binomials.
+    """
+    n_bunnies_per_key = len(holders)
+    key = 0
+    previous_bunny = -1
+    for position, bunny in enumerate(holders):
+        remaining = n_bunnies_per_key - position
+        key += binomial(n_bunnies - previous_bunny - 1, remaining) - binomial(
+            n_bunnies - bunny, remaining
+        )
+        previous_bunny = bunny
+    return key
+
+
+def pascal_triangle(n, k):
+    """
+    binomials[m][j] == binomial(m, j) for every m <= n and j <= k, so that ranking
+    many groups costs lookups instead of binomial loops.
+    """
+    binomials = [[1] + [0] * k]
+    for m in range(1, n + 1):
+        previous = binomials[-1]
+        binomials.append([1] + [previous[j - 1] + previous[j] for j in range(1, k + 1)])
+    return binomials
+
+
+def bunny_keys(n_bunnies, n_required, bunny):
+    """
+    Generator of the keys of one bunny, in increasing order, without building the
+    other bunnies' keys: these are the groups containing the bunny, i.e. the groups
+    of the other bunnies (one bunny smaller) with the bunny inserted. Inserting
+    the bunny keeps the lexicographic order, so the keys come out sorted.
+    Each key is the sum of the terms of key_index, whose partial sums are kept
+    and only updated from the first holder that changed since the previous group
+    (most of the time, the last one).
+    """
+    if n_required == 0 or n_required > n_bunnies:
+        return
+    n_bunnies_per_key = n_bunnies - n_required + 1
+    binomials = pascal_triangle(n_bunnies, n_bunnies_per_key)
+    other_bunnies = [other for other in range(n_bunnies) if other != bunny]
+    n_others = n_bunnies_per_key - 1
+
+    # indexes (in other_bunnies) of the other holders, advanced like
+    # itertools.combinations, with the first one that changed
+    indexes = list(range(n_others))
+    changed = 0
+    holders = [0] * n_bunnies_per_key
+    partial_keys = [0] * (n_bunnies_per_key + 1)
+    bunny_position = None
+    while True:
+        # Where the bunny is inserted among the other holders
+        new_bunny_position = 0
+        while (
+            new_bunny_position < n_others
+            and other_bunnies[indexes[new_bunny_position]] < bunny
+        ):
+            new_bunny_position += 1
+        if bunny_position is None:
+            first = 0
+        elif new_bunny_position == bunny_position:
+            first = changed + (changed >= bunny_position)
+        else:
+            first = min(changed, bunny_position, new_bunny_position)
+        bunny_position = new_bunny_position
+
+        for position in range(first, n_bunnies_per_key):
+            if position < bunny_position:
+                holder = other_bunnies[indexes[position]]
+            elif position == bunny_position:
+                holder = bunny
+            else:
+                holder = other_bunnies[indexes[position - 1]]
+            holders[position] = holder
+            previous_holder = holders[position - 1] if position else -1
+            remaining = n_bunnies_per_key - position
+            partial_keys[position + 1] = (
+                partial_keys[position]
+                + binomials[n_bunnies - previous_holder - 1][remaining]
+                - binomials[n_bunnies - holder][remaining]
+            )
+        yield partial_keys[n_bunnies_per_key]
+
+        # Next group of the other bunnies
+        changed = n_others - 1
+        while changed >= 0 and indexes[changed] == changed + n_bunnies - 1 - n_others:
+            changed -= 1
+        if changed < 0:
+            return
+        indexes[changed] += 1
+        for position in range(changed + 1, n_others):
+            indexes[position] = indexes[position - 1] + 1
+
+
+def iter_solution(n_bunnies, n_required):
+    """
+    Streaming version of solution: yields, for each bunny in order, a generator
+    of its keys (see bunny_keys).
+    """
+    for bunny in range(n_bunnies):
+        yield bunny_keys(n_bunnies, n_required, bunny)
+
+
+def array_solution(n_bunnies, n_required):
+    """
+    Same table as solution (and built the same way, from a single enumeration of
+    the groups), with one compact array of keys per bunny.
+    """
+    typecode = "L" if count_keys(n_bunnies, n_required) < 2**32 else "Q"
+    arrays = [array(typecode) for _ in range(n_bunnies)]
+    appends = [keys.append for keys in arrays]
+    for key, holders in enumerate(
+        itertools.combinations(range(n_bunnies), n_bunnies - n_required + 1)
+    ):
+        for bunny in holders:
+            appends[bunny](key)
+    return arrays
+
+
+def solution(n_bunnies, n_required):
     # For each key, we will distribute (n_buns - n_required + 1) copies of the key to the bunnies
     n_bunnies_per_key = n_bunnies - n_required + 1
 
@@ -25,3 +186,235 @@ def solution(n_bunnies, n_required):
             solution[bunny_index].append(i)
 
     return solution
+
+
+def key_bitsets(distribution):
+    """
+    The keys of each bunny of a distribution (a list of key lists, as returned by
+    solution) as a bitset: an int where the bit k is set if the bunny has the key k.
+    Also returns the bitset of all the keys.
+    """
+    bitsets = []
+    all_keys = 0
+    for keys in distribution:
+        # Setting the bits in a buffer first, ORing them one by one in an int
+        # would copy the int for every key
+        buffer = bytearray((max(keys) >> 3) + 1 if len(keys) else 0)
+        for key in keys:
+            buffer[key >> 3] |= 1 << (key & 7)
+        bitset = int.from_bytes(buffer, "little")
+        bitsets.append(bitset)
+        all_keys |= bitset
+    return bitsets, all_keys
+
+
+def find_failing_group(bitsets, all_keys, group, start, group_size, keys, must_cover):
+    """
+    Depth-first search over the groups of group_size bunnies extending group with
+    bunnies from start on, carrying the union of the keys of group (keys) so that
+    each group costs a single OR. Returns the first group that covers all the keys
+    when it must not (or the other way around), or None.
+    """
+    if len(group) == group_size:
+        if (keys == all_keys) != must_cover:
+            return tuple(group)
+        return None
+    if keys == all_keys and not must_cover:
+        # Every bigger group will cover all the keys too
+        return tuple(group) + tuple(range(start, start + group_size - len(group)))
+    for bunny in range(start, len(bitsets) - (group_size - len(group)) + 1):
+        group.append(bunny)
+        failing_group = find_failing_group(
+            bitsets,
+            all_keys,
+            group,
+            bunny + 1,
+            group_size,
+            keys | bitsets[bunny],
+            must_cover,
+        )
+        group.pop()
+        if failing_group is not None:
+            return failing_group
+    return None
+
+
+# Bitsets of the distribution being checked, sent once to each worker process
+# of find_counterexample (see start_sweep_worker) instead of with every shard
+sweep_bitsets = None
+sweep_all_keys = None
+
+
+def start_sweep_worker(bitsets, all_keys):
+    global sweep_bitsets, sweep_all_keys
+    sweep_bitsets = bitsets
+    sweep_all_keys = all_keys
+
+
+def sweep_shard(task):
+    """
+    Worker side of find_counterexample: checks the groups starting with the
+    bunnies of prefix.
+    """
+    prefix, group_size, must_cover = task
+    keys = 0
+    for bunny in prefix:
+        keys |= sweep_bitsets[bunny]
+    return find_failing_group(
+        sweep_bitsets,
+        sweep_all_keys,
+        list(prefix),
+        prefix[-1] + 1,
+        group_size,
+        keys,
+        must_cover,
+    )
+
+
+def find_counterexample(distribution, n_required, workers=None):
+    """
+    Brute-force check of any distribution, with one bitset per bunny: every group
+    of n_required bunnies must have all the keys (that some bunny has), and no
+    group of n_required - 1 bunnies can. Returns a group that breaks this, or None.
+    The groups are split by their two smallest bunnies (so that the shards are
+    balanced enough) across a pool of worker processes. workers defaults to the
+    number of CPUs; with a single worker, everything runs in this process.
+    """
+    bitsets, all_keys = key_bitsets(distribution)
+    n_bunnies = len(distribution)
+    tasks = []
+    for group_size, must_cover in ((n_required, True), (n_required - 1, False)):
+        if not 0 <= group_size <= n_bunnies:
+            continue
+        if group_size == 0:
+            # The empty group has no keys
+            if (all_keys == 0) != must_cover:
+                return ()
+            continue
+        prefix_size = min(group_size, 2)
+        tasks += [
+            (prefix, group_size, must_cover)
+            for prefix in itertools.combinations(
+                range(n_bunnies - group_size + prefix_size), prefix_size
+            )
+        ]
+
+    if workers == 1 or not tasks:
+        start_sweep_worker(bitsets, all_keys)
+        for task in tasks:
+            failing_group = sweep_shard(task)
+            if failing_group is not None:
+                return failing_group
+        return None
+
+    import multiprocessing  # slow to import, and only needed here
+
+    with multiprocessing.Pool(
+        workers, initializer=start_sweep_worker, initargs=(bitsets, all_keys)
+    ) as pool:
+        for failing_group in pool.imap_unordered(sweep_shard, tasks):
+            if failing_group is not None:
+                return failing_group
+    return None
+
+
+def is_canonical(distribution, n_required):
+    """
+    Whether the distribution is the one of solution(len(distribution),
+    n_required), compared while enumerating the groups of holders as solution
+    does, without building its table. Distributions with a wrong number of keys
+    for some bunny are told apart right away.
+    """
+    n_bunnies = len(distribution)
+    if not 0 <= n_required <= n_bunnies + 1:
+        return False
+    keys_per_bunny = binomial(n_bunnies - 1, n_bunnies - n_required)
+    if any(len(keys) != keys_per_bunny for keys in distribution):
+        return False
+    positions = [0] * n_bunnies
+    for key, holders in enumerate(
+        itertools.combinations(range(n_bunnies), n_bunnies - n_required + 1)
+    ):
+        for bunny in holders:
+            if distribution[bunny][positions[bunny]] != key:
+                return False
+            positions[bunny] += 1
+    return True
+
+
+def verify_solution(n_bunnies, n_required, distribution=None, workers=None):
+    """
+    Checks the distribution of solution (built if not given) without any brute
+    force, using its symmetry: the key of a group of holders goes to the same
+    group of bunnies once they are renamed, so renaming the bunnies only renames
+    the keys, and every group of the same size has the same number of keys.
+    Checking a single group of each size is then enough (bunnies 0 to
+    n_required - 1, and 0 to n_required - 2), with the bitsets of these bunnies
+    only. Returns a group that doesn't work, or None.
+    This shortcut only holds for the construction of solution: any other
+    distribution given is checked with find_counterexample instead.
+    """
+    if distribution is None:
+        distribution = solution(n_bunnies, n_required)
+    elif len(distribution) != n_bunnies or not is_canonical(distribution, n_required):
+        return find_counterexample(distribution, n_required, workers)
+
+    bitsets, _ = key_bitsets(distribution[: max(n_required, 0)])
+    all_keys = (1 << count_keys(n_bunnies, n_required)) - 1
+    for group_size, must_cover in ((n_required, True), (n_required - 1, False)):
+        if not 0 <= group_size <= n_bunnies:
+            continue
+        keys = 0
+        for bitset in bitsets[:group_size]:
+            keys |= bitset
+        if (keys == all_keys) != must_cover:
+            return tuple(range(group_size))
+    return None
+
+
+def verify(distribution, n_required, workers=None):
+    """
+    Returns a group of bunnies breaking the distribution (see
+    find_counterexample), or None if it works: with the symmetry shortcut of
+    verify_solution if the distribution is the one of solution, and
+    find_counterexample otherwise.
+    """
+    return verify_solution(len(distribution), n_required, distribution, workers)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    for n_bunnies, n_required in ((2, 1), (5, 3), (4, 4), (9, 0), (16, 8), (20, 10)):
+        distribution = solution(n_bunnies, n_required)
+        for label, check in (
+            (
+                "verify_solution",
+                lambda: verify_solution(n_bunnies, n_required, distribution),
+            ),
+            (
+                "find_counterexample, 1 worker",
+                lambda: find_counterexample(distribution, n_required, 1),
+            ),
+            (
+                "find_counterexample",
+                lambda: find_counterexample(distribution, n_required),
+            ),
+        ):
+            start = time.time()
+            failing_group = check()
+            end = time.time()
+            assert failing_group is None
+            print(
+                "%2d bunnies, %d required: %-30s took %.4fs"
+                % (n_bunnies, n_required, label, end - start)
+            )
+
+    # A broken distribution: one copy of a key is lost
+    randomizer = random.Random(0)
+    distribution = solution(9, 5)
+    distribution[randomizer.randrange(9)].pop()
+    failing_group = verify(distribution, 5)
+    print("broken distribution, failing group: %s" % (failing_group,))
+    assert failing_group is not None
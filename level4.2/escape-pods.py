@@ -1,5 +1,21 @@
+from collections import deque
+from contextlib import nullcontext
+
 MAXIMUM_FLOW = 2000000  # or float("Inf")
 
+try:
+    from foobar.support import phase
+except ImportError:  # run on its own, see foobar/support.py
+
+    def phase(recorder, name):
+        if recorder is None:
+            return nullcontext()
+        return recorder.phase(name)
+
+
+# Opt-in instrumentation, see benchmarks/instrumentation.py (None when off)
+recorder = None
+
 
 def transform_matrix_into_single_source_and_sink(entrances, exits, matrix):
     # We put the source in the 0 position
@@ -35,6 +51,8 @@ def find_path(matrix):
     # e.g. if path = [-1, 0, 1, 1, 2, 4]
     # then the path is sink -> 4 -> 2 -> 1 -> 0 (= source)
     path = [None for i in range(len(matrix))]
+    if recorder is not None:
+        recorder.count("find_path_calls")
 
     # We parse all connected nodes
     visited_nodes = []
@@ -68,7 +86,7 @@ def find_path(matrix):
             return path
 
 
-def solution(entrances, exits, matrix):
+def matrix_solution(entrances, exits, matrix):
     """
     Edmonds-Karp algorithm for computing maximum flow.
     This (french) lecture on maximum flow was useful:
@@ -96,6 +114,8 @@ def solution(entrances, exits, matrix):
             )
             current_node = path[current_node]  # move towards source
         maximum_flow += current_path_flow
+        if recorder is not None:
+            recorder.count("augmenting_paths")
 
         # adjust (update) the residual graph
         # (from sink to source)
@@ -110,3 +130,454 @@ def solution(entrances, exits, matrix):
         path = find_path(matrix)
 
     return maximum_flow
+
+
+class FlowNetwork(object):
+    """
+    Residual graph stored as adjacency lists, for Dinic's algorithm.
+    Edges are numbered in pairs, so that the reverse (residual) edge of the edge e
+    is always e ^ 1: heads[e] is the node the edge e goes to, and capacities[e]
+    its residual capacity.
+    """
+
+    def __init__(self, n_nodes):
+        self.adjacency = [[] for _ in range(n_nodes)]
+        self.heads = []
+        self.capacities = []
+        # Levels of the last breadth-first search of max_flow: once the maximum
+        # flow is reached, the nodes it reached (level >= 0) are the source side
+        # of a minimum cut
+        self.last_level = None
+
+    def add_edge(self, u, v, capacity):
+        edge = len(self.heads)
+        self.heads += [v, u]
+        self.capacities += [capacity, 0]
+        self.adjacency[u].append(edge)
+        self.adjacency[v].append(edge + 1)
+        return edge
+
+    def levels(self, source):
+        """
+        Breadth-first search from the source in the residual graph, returning the
+        level (distance) of every node, or -1 for the nodes that can't be reached.
+        """
+        level = [-1] * len(self.adjacency)
+        level[source] = 0
+        nodes_to_visit = deque([source])
+        while nodes_to_visit:
+            u = nodes_to_visit.popleft()
+            for edge in self.adjacency[u]:
+                v = self.heads[edge]
+                if self.capacities[edge] > 0 and level[v] < 0:
+                    level[v] = level[u] + 1
+                    nodes_to_visit.append(v)
+        return level
+
+    def blocking_flow(self, source, sink, level, limit=None):
+        """
+        Saturates the level graph with augmenting paths, found by an iterative
+        depth-first search (the paths can be longer than the recursion limit).
+        progress[u] is the next edge to try from u: edges that lead nowhere are
+        never tried again during this phase.
+        If a limit is given, we stop once that much flow has been sent.
+        """
+        adjacency = self.adjacency
+        heads = self.heads
+        capacities = self.capacities
+        progress = [0] * len(adjacency)
+        flow = 0
+        path = []  # edges from the source to u
+        u = source
+        while True:
+            if u == sink:
+                path_flow = min(capacities[edge] for edge in path)
+                if limit is not None:
+                    path_flow = min(path_flow, limit - flow)
+                for edge in path:
+                    capacities[edge] -= path_flow
+                    capacities[edge ^ 1] += path_flow
+                flow += path_flow
+                if recorder is not None:
+                    recorder.count("augmenting_paths")
+                    recorder.observe("path_length", len(path))
+                if flow == limit:
+                    return flow
+                path = []
+                u = source
+                continue
+
+            edges = adjacency[u]
+            while progress[u] < len(edges):
+                edge = edges[progress[u]]
+                if capacities[edge] > 0 and level[heads[edge]] == level[u] + 1:
+                    break
+                progress[u] += 1
+            else:
+                # Dead end, we go back one step (or stop if we are at the source)
+                if u == source:
+                    return flow
+                level[u] = -1
+                edge = path.pop()
+                u = heads[edge ^ 1]
+                progress[u] += 1
+                continue
+
+            path.append(edge)
+            u = heads[edge]
+
+    def max_flow(self, source, sink, limit=None):
+        """
+        Dinic's algorithm: we build the level graph, saturate it, and repeat
+        until the sink can't be reached anymore (or until we sent limit).
+        The flow is added on top of the flow already in the residual graph.
+        """
+        flow = 0
+        while flow != limit:
+            level = self.last_level = self.levels(source)
+            if level[sink] < 0:
+                break
+            if recorder is not None:
+                recorder.count("dinic_phases")
+            flow += self.blocking_flow(
+                source, sink, level, None if limit is None else limit - flow
+            )
+        return flow
+
+    def edge_flows(self, edges):
+        """
+        Yields (u, v, flow) for each of the given (forward) edges carrying flow.
+        """
+        heads = self.heads
+        capacities = self.capacities
+        for edge in edges:
+            flow = capacities[edge ^ 1]
+            if flow > 0:
+                yield heads[edge ^ 1], heads[edge], flow
+
+    def cut_edges(self, edges, level):
+        """
+        Yields (u, v, capacity) for each of the given (forward) edges going from
+        the nodes reached in level to the others. With the level of the last
+        search of max_flow, these are the (saturated) edges of a minimum cut.
+        """
+        heads = self.heads
+        capacities = self.capacities
+        for edge in edges:
+            u, v = heads[edge ^ 1], heads[edge]
+            if level[u] >= 0 and level[v] < 0:
+                capacity = capacities[edge] + capacities[edge ^ 1]
+                if capacity > 0:
+                    yield u, v, capacity
+
+    def set_capacity(self, edge, capacity, source, sink):
+        """
+        Changes the capacity of the (forward) edge, keeping a valid flow from the
+        source to the sink: if the edge now carries more flow than its capacity,
+        the excess is rerouted around the edge when possible, and cancelled back
+        to the source and from the sink otherwise.
+        Returns how much the flow from the source to the sink decreased (it is up
+        to the caller to look for new augmenting paths after an increase).
+        """
+        capacities = self.capacities
+        flow = capacities[edge ^ 1]
+        if capacity >= flow:
+            capacities[edge] = capacity - flow
+            return 0
+
+        excess = flow - capacity
+        if recorder is not None:
+            recorder.count("excess_reroutes")
+        capacities[edge] = 0
+        capacities[edge ^ 1] = capacity
+        # u now receives excess more than it sends, and v excess less
+        u, v = self.heads[edge ^ 1], self.heads[edge]
+        cancelled = excess - self.max_flow(u, v, excess)
+        if cancelled:
+            if u != source:
+                self.max_flow(u, source, cancelled)
+            if v != sink:
+                self.max_flow(sink, v, cancelled)
+        return cancelled
+
+
+def build_network(entrances, exits, matrix):
+    """
+    Builds the flow network of the corridors, with a virtual source (node n) going
+    to every entrance and a virtual sink (node n + 1) coming from every exit.
+    The virtual edges can carry more than everything that could go out of an
+    entrance (or into an exit), which is the same as an unbounded capacity, and
+    they are never saturated (so that the minimum cut is only made of corridors).
+    """
+    n_rooms = len(matrix)
+    network = FlowNetwork(n_rooms + 2)
+    for u, row in enumerate(matrix):
+        for v, capacity in enumerate(row):
+            if capacity > 0 and u != v:
+                network.add_edge(u, v, capacity)
+    for entrance in entrances:
+        network.add_edge(n_rooms, entrance, sum(matrix[entrance]) + 1)
+    for exit in exits:
+        network.add_edge(exit, n_rooms + 1, sum(row[exit] for row in matrix) + 1)
+    return network
+
+
+def solution(entrances, exits, matrix):
+    """
+    Maximum flow with Dinic's algorithm on adjacency lists (see FlowNetwork),
+    without copying the matrix for the single source and sink.
+    """
+    with phase(recorder, "build_network"):
+        network = build_network(entrances, exits, matrix)
+    with phase(recorder, "max_flow"):
+        return network.max_flow(len(matrix), len(matrix) + 1)
+
+
+def detailed_solution(entrances, exits, matrix):
+    """
+    Same maximum flow as solution, along with what its residual graph already
+    tells us (without solving again): the flow going through each corridor, and
+    the corridors of a minimum cut (the bottlenecks, whose capacities sum up to
+    the maximum flow). Both are generators over the corridors that matter only,
+    of (u, v, flow) and (u, v, capacity) respectively.
+    """
+    n_rooms = len(matrix)
+    with phase(recorder, "build_network"):
+        network = build_network(entrances, exits, matrix)
+    with phase(recorder, "max_flow"):
+        maximum_flow = network.max_flow(n_rooms, n_rooms + 1)
+
+    # build_network adds the corridors first, then the virtual edges
+    corridor_edges = range(0, len(network.heads) - 2 * (len(entrances) + len(exits)), 2)
+    return (
+        maximum_flow,
+        network.edge_flows(corridor_edges),
+        network.cut_edges(corridor_edges, network.last_level),
+    )
+
+
+class IncrementalFlow(object):
+    """
+    Keeps the residual graph of the corridors (see build_network) between
+    capacity changes, so that a change only re-augments (or cancels) the flow
+    where needed instead of solving everything again from zero flow.
+    """
+
+    def __init__(self, entrances, exits, matrix):
+        self.n_rooms = len(matrix)
+        self.source = self.n_rooms
+        self.sink = self.n_rooms + 1
+        self.network = FlowNetwork(self.n_rooms + 2)
+        self.corridors = {}  # (u, v) -> edge
+        self.out_capacities = [0] * self.n_rooms
+        self.in_capacities = [0] * self.n_rooms
+        for u, row in enumerate(matrix):
+            for v, capacity in enumerate(row):
+                if capacity > 0 and u != v:
+                    self.corridors[(u, v)] = self.network.add_edge(u, v, capacity)
+                    self.out_capacities[u] += capacity
+                    self.in_capacities[v] += capacity
+
+        # Virtual edges, never saturated (see build_network)
+        self.entrance_edges = {}
+        for entrance in entrances:
+            self.entrance_edges[entrance] = self.network.add_edge(
+                self.source, entrance, self.out_capacities[entrance] + 1
+            )
+        self.exit_edges = {}
+        for exit in exits:
+            self.exit_edges[exit] = self.network.add_edge(
+                exit, self.sink, self.in_capacities[exit] + 1
+            )
+
+        self.max_flow = self.network.max_flow(self.source, self.sink)
+
+    def capacity(self, u, v):
+        edge = self.corridors.get((u, v))
+        if edge is None:
+            return 0
+        return self.network.capacities[edge] + self.network.capacities[edge ^ 1]
+
+    def set_capacity(self, u, v, capacity):
+        """
+        Changes the capacity of the corridor from u to v, and updates the maximum
+        flow. Returns the new maximum flow.
+        """
+        if u == v:
+            return self.max_flow
+        delta = capacity - self.capacity(u, v)
+        edge = self.corridors.get((u, v))
+        if edge is None:
+            edge = self.corridors[(u, v)] = self.network.add_edge(u, v, 0)
+
+        self.max_flow -= self.network.set_capacity(
+            edge, capacity, self.source, self.sink
+        )
+        self.out_capacities[u] += delta
+        self.in_capacities[v] += delta
+        if u in self.entrance_edges:
+            self.network.set_capacity(
+                self.entrance_edges[u],
+                self.out_capacities[u] + 1,
+                self.source,
+                self.sink,
+            )
+        if v in self.exit_edges:
+            self.network.set_capacity(
+                self.exit_edges[v], self.in_capacities[v] + 1, self.source, self.sink
+            )
+
+        self.max_flow += self.network.max_flow(self.source, self.sink)
+        return self.max_flow
+
+    def change_capacity(self, u, v, delta):
+        return self.set_capacity(u, v, self.capacity(u, v) + delta)
+
+    def min_cut(self):
+        """
+        Corridors (u, v) from the rooms still reachable from the entrances in the
+        residual graph to the others: they are saturated, and their capacities
+        sum up to the maximum flow.
+        """
+        return sorted(
+            (u, v)
+            for u, v, _ in self.network.cut_edges(
+                self.corridors.values(), self.network.levels(self.source)
+            )
+        )
+
+    def edge_flows(self):
+        """
+        Flow going through each corridor, as (u, v, flow) for the corridors
+        carrying some.
+        """
+        return self.network.edge_flows(self.corridors.values())
+
+
+def random_corridors(n_rooms, n_corridors_per_room, randomizer):
+    """
+    Random matrix where each room has a few corridors to other rooms.
+    """
+    matrix = [[0] * n_rooms for _ in range(n_rooms)]
+    for u in range(n_rooms):
+        for _ in range(n_corridors_per_room):
+            matrix[u][randomizer.randrange(n_rooms)] = randomizer.randint(1, 100)
+    return matrix
+
+
+def layered_corridors(n_layers, layer_width, randomizer):
+    """
+    Matrix of rooms organized in layers, where every room is connected to every
+    room of the next layer. The first layer are the entrances, the last the exits.
+    """
+    n_rooms = n_layers * layer_width
+    matrix = [[0] * n_rooms for _ in range(n_rooms)]
+    for layer in range(n_layers - 1):
+        for i in range(layer_width):
+            for j in range(layer_width):
+                matrix[layer * layer_width + i][(layer + 1) * layer_width + j] = (
+                    randomizer.randint(1, 100)
+                )
+    return matrix
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    assert (
+        solution([0], [3], [[0, 7, 0, 0], [0, 0, 6, 0], [0, 0, 0, 8], [9, 0, 0, 0]])
+        == 6
+    )
+    assert (
+        solution(
+            [0, 1],
+            [4, 5],
+            [
+                [0, 0, 4, 6, 0, 0],
+                [0, 0, 5, 2, 0, 0],
+                [0, 0, 0, 0, 4, 4],
+                [0, 0, 0, 0, 6, 6],
+                [0, 0, 0, 0, 0, 0],
+                [0, 0, 0, 0, 0, 0],
+            ],
+        )
+        == 16
+    )
+
+    randomizer = random.Random(0)
+    graphs = []
+    for n_rooms in (50, 200, 1000, 3000):
+        matrix = random_corridors(n_rooms, 5, randomizer)
+        entrances = list(range(n_rooms // 10))
+        exits = list(range(n_rooms - n_rooms // 10, n_rooms))
+        graphs.append(("random, %d rooms" % n_rooms, entrances, exits, matrix))
+    for n_layers, layer_width in ((5, 10), (10, 20), (20, 50), (50, 50)):
+        matrix = layered_corridors(n_layers, layer_width, randomizer)
+        n_rooms = len(matrix)
+        entrances = list(range(layer_width))
+        exits = list(range(n_rooms - layer_width, n_rooms))
+        graphs.append(("layered, %d rooms" % n_rooms, entrances, exits, matrix))
+
+    for label, entrances, exits, matrix in graphs:
+        functions = [solution]
+        # (matrix_solution's breadth-first search is greedy and can miss some paths)
+        if len(matrix) <= 100:
+            functions.append(matrix_solution)
+        for function in functions:
+            start = time.time()
+            answer = function(entrances, exits, [list(row) for row in matrix])
+            end = time.time()
+            print(
+                "%-22s %-16s %8d  took %.4fs"
+                % (label, function.__name__, answer, end - start)
+            )
+
+    # Stream of corridor changes, incremental flow vs solving again every time
+    label, entrances, exits, matrix = graphs[2]
+    matrix = [list(row) for row in matrix]
+    updates = []
+    for _ in range(200):
+        u, v = randomizer.randrange(len(matrix)), randomizer.randrange(len(matrix))
+        updates.append((u, v, max(0, matrix[u][v] + randomizer.randint(-50, 50))))
+
+    start = time.time()
+    flow = IncrementalFlow(entrances, exits, matrix)
+    incremental_answers = [
+        flow.set_capacity(u, v, capacity) for u, v, capacity in updates
+    ]
+    end = time.time()
+    print(
+        "%s, %d updates, IncrementalFlow took %.4fs"
+        % (label, len(updates), end - start)
+    )
+
+    start = time.time()
+    answers = []
+    for u, v, capacity in updates:
+        matrix[u][v] = capacity
+        answers.append(solution(entrances, exits, matrix))
+    end = time.time()
+    print("%s, %d updates, solution took %.4fs" % (label, len(updates), end - start))
+    assert answers == incremental_answers
+    assert sum(matrix[u][v] for u, v in flow.min_cut()) == flow.max_flow
+
+    # Flows and minimum cut of the final maximum flow, from the same pass
+    for label, entrances, exits, matrix in graphs:
+        start = time.time()
+        answer, edge_flows, min_cut = detailed_solution(entrances, exits, matrix)
+        edge_flows = list(edge_flows)
+        min_cut = list(min_cut)
+        end = time.time()
+        print(
+            "%-22s detailed_solution %8d  took %.4fs (%d corridors with flow, "
+            "%d in the minimum cut)"
+            % (label, answer, end - start, len(edge_flows), len(min_cut))
+        )
+        assert sum(capacity for _, _, capacity in min_cut) == answer
+        assert all(flow <= matrix[u][v] for u, v, flow in edge_flows)
+        balance = [0] * len(matrix)
+        for u, v, flow in edge_flows:
+            balance[u] -= flow
+            balance[v] += flow
+        assert sum(balance[exit] for exit in exits) == answer
@@ -1,5 +1,7 @@
+from array import array
 from itertools import product
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from contextlib import nullcontext
 
 """
     The process the nebula goes through is similar to the "game of life",
@@ -31,8 +33,41 @@ from collections import defaultdict
     - Then I needed to replace the data structure I was using for the working_rows cache
     (list) with something more appropriate (defaultdict used as counters),
     sacrificing the exhibition of the constructed solutions for speed.
+    - Finally, the row-by-row approach is really a transfer matrix: rows are stored as
+    integer bitmasks, and for a given nebula row we can build once the index of which
+    next rows are compatible with each previous row (column by column, so only the
+    compatible pairs are ever generated). Counts are then carried forward in a dense list
+    indexed by the bitmask, and the index is reused for every row sharing the same pattern.
+    - On wide nebulae, the lists of next rows take most of the memory: the compact backend
+    stores the same index in flat typed arrays grouped by next row, so that each row is a
+    gather of the counts and a sum per group (vectorized with NumPy, with the huge counts
+    split in 32-bit limbs).
+    - Nothing in the transfer matrix is specific to the nebula rule: CellularAutomaton
+    compiles any k x k rule (as a lookup table) into column extensions, with free, fixed
+    or toroidal boundaries.
 """
 
+try:
+    from foobar.support import load_numpy, phase
+except ImportError:  # run on its own, see foobar/support.py
+
+    def load_numpy():
+        try:
+            import numpy
+        except ImportError:
+            return None
+        return numpy
+
+    def phase(recorder, name):
+        if recorder is None:
+            return nullcontext()
+        return recorder.phase(name)
+
+
+# Opt-in instrumentation, see benchmarks/instrumentation.py (None when off)
+recorder = None
+
+
 # Generating all possible combinations
 # e.g. {(False, False, True, False): True,
 #       (False, False, True, True): False,
@@ -42,7 +77,7 @@ combination = {
 }
 
 
-def solution(nebula):
+def row_by_row_solution(nebula):
     """
     This will build all working solutions "row by row". We first start by enumerating
     all (2, m+1) "double-rows" possibilities which would lead to the first row of our
@@ -97,6 +132,8 @@ def solution(nebula):
                     # possibility tree, towards the leaves)
 
         working_rows = new_working_rows
+        if recorder is not None:
+            recorder.observe("frontier_size", len(working_rows))
 
         # If no working possibilities at that stage, return an empty list ("garden of eden")
         if len(working_rows.keys()) == 0:
@@ -105,30 +142,859 @@ def solution(nebula):
     return sum(working_rows.values())
 
 
-nebula = [[True, False, True], [False, True, False], [True, False, True]]  # 4
-print(solution(nebula))
-
-nebula = [
-    [True, True, False, True, False, True, False, True, True, False],
-    [True, True, False, False, False, False, True, True, True, False],
-    [True, True, False, False, False, False, False, False, False, True],
-    [False, True, False, False, False, False, True, True, False, False],
-]  # 11567
-import time
-
-start = time.time()
-print("final answer sol2", solution(nebula))
-end = time.time()
-print("took", end - start)
-
-nebula = [
-    [True, False, True, False, False, True, True, True],
-    [True, False, True, False, False, False, True, False],
-    [True, True, True, False, False, False, True, False],
-    [True, False, True, False, False, False, True, False],
-    [True, False, True, False, False, True, True, True],
-]  # 254
-start = time.time()
-print("final answer sol2", solution(nebula))
-end = time.time()
-print("took", end - start)
+# For the transfer-matrix approach we look at the (previous row, next row) pair one
+# column at a time. A column is encoded as an integer: bit 0 is the cell in the previous
+# row, bit 1 the cell in the next row. For a given target cell and left column, we list
+# the right columns that would produce the target cell.
+# e.g. {(True, 0): [1, 2], (True, 1): [0], ...}
+column_extensions = {
+    (target, left): [
+        right
+        for right in range(4)
+        if combination[
+            (bool(left & 1), bool(right & 1), bool(left & 2), bool(right & 2))
+        ]
+        == target
+    ]
+    for target in (True, False)
+    for left in range(4)
+}
+
+
+def build_transitions(pattern):
+    """
+    Builds the transition index for one nebula row (the pattern, a tuple of bools).
+    Rows of the previous state are stored as integer bitmasks (bit i is the cell i),
+    and transitions[previous_row] is the list of next rows that are compatible with
+    previous_row for this pattern.
+    The pairs are built column by column, so that we only ever generate compatible
+    pairs instead of checking every (previous row, next row) possibility.
+    """
+    width = len(pattern) + 1
+    pairs = [(column & 1, column >> 1) for column in range(4)]
+    for i, target in enumerate(pattern):
+        extended_pairs = []
+        for previous_row, next_row in pairs:
+            left = (previous_row >> i & 1) | (next_row >> i & 1) << 1
+            for right in column_extensions[(target, left)]:
+                extended_pairs.append(
+                    (
+                        previous_row | (right & 1) << (i + 1),
+                        next_row | (right >> 1) << (i + 1),
+                    )
+                )
+        pairs = extended_pairs
+
+    transitions = [[] for _ in range(1 << width)]
+    for previous_row, next_row in pairs:
+        transitions[previous_row].append(next_row)
+    return transitions
+
+
+class TransitionCache(object):
+    """
+    Bounded LRU cache of transition indexes (built by build_transitions, unless
+    another build function is given), keyed by the nebula row pattern (or by
+    whatever the build function takes). It lives across solution() calls, so that nebulae sharing
+    columns (after the transpose) don't rebuild the same transitions again.
+    Misses are counted by the recorder under the counter name.
+    """
+
+    def __init__(
+        self, maxsize=256, build=build_transitions, counter="transition_builds"
+    ):
+        self.maxsize = maxsize
+        self.build = build
+        self.counter = counter
+        self.hits = 0
+        self.misses = 0
+        self._transitions = OrderedDict()
+
+    def get(self, pattern, build=None):
+        """
+        The value of pattern, built on a miss by the build function given here, or
+        else by the one of the cache.
+        """
+        transitions = self._transitions.get(pattern)
+        if transitions is not None:
+            self.hits += 1
+            self._transitions.move_to_end(pattern)
+            return transitions
+
+        self.misses += 1
+        if recorder is not None:
+            recorder.count(self.counter)
+        if build is None:
+            build = self.build
+        transitions = self._transitions[pattern] = build(pattern)
+        if len(self._transitions) > self.maxsize:
+            self._transitions.popitem(last=False)  # least recently used
+        return transitions
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._transitions),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+        self._transitions.clear()
+
+
+# Shared by all the calls in this process
+transition_cache = TransitionCache()
+
+
+def normalize_nebula(nebula):
+    """
+    Transposes the nebula if it has more columns than rows (the number of
+    possibilities is the same, see row_by_row_solution), and returns it as a
+    hashable tuple of row patterns.
+    """
+    if len(nebula) < len(nebula[0]):
+        nebula = zip(*nebula)
+    return tuple(tuple(bool(cell) for cell in row) for row in nebula)
+
+
+def count_preimages(patterns, cache):
+    """
+    Counts the previous states of a normalized nebula (see normalize_nebula).
+    The counts of working rows are kept in a dense list indexed by the row bitmask,
+    and each nebula row is applied through its transition index.
+    """
+    n_states = 1 << (len(patterns[0]) + 1)
+
+    # Initialization: every (1, m+1) row is a possibility
+    counts = [1] * n_states
+    for pattern in patterns:
+        transitions = cache.get(pattern)
+        new_counts = [0] * n_states
+        for previous_row, count in enumerate(counts):
+            if count:
+                for next_row in transitions[previous_row]:
+                    new_counts[next_row] += count
+        counts = new_counts
+        if recorder is not None:
+            recorder.observe("frontier_size", n_states - counts.count(0))
+
+        # No working possibilities at that stage ("garden of eden")
+        if not any(counts):
+            return 0
+
+    return sum(counts)
+
+
+def solution(nebula, cache=None):
+    """
+    Transfer-matrix version of the row-by-row solution above, with the transition
+    indexes taken from the shared transition_cache (unless another cache is given).
+    """
+    if cache is None:
+        cache = transition_cache
+    with phase(recorder, "normalize"):
+        patterns = normalize_nebula(nebula)
+    with phase(recorder, "count_preimages"):
+        return count_preimages(patterns, cache)
+
+
+# Answers of batch_solution, keyed by the normalized nebula, so that grids
+# already seen by a previous batch aren't counted again
+answer_cache = TransitionCache(
+    maxsize=1024,
+    build=lambda patterns: count_preimages(patterns, transition_cache),
+    counter="answer_misses",
+)
+
+
+def batch_solution(nebulae, cache=None):
+    """
+    Solves many nebulae at once: duplicate grids are only counted once (in this
+    batch or a previous one, see answer_cache), and all of them share the same
+    transition cache. Returns the answers in the input order.
+    """
+    if cache is None:
+        cache = transition_cache
+
+    def count(patterns):
+        return count_preimages(patterns, cache)
+
+    return [answer_cache.get(normalize_nebula(nebula), count) for nebula in nebulae]
+
+
+# The column extensions again, flattened for the compact backend: for a target,
+# the right columns extending the left column are
+# extension_rights[target][extension_starts[target][left] + k], for k below
+# extension_counts[target][left]
+extension_counts = {
+    target: [len(column_extensions[(target, left)]) for left in range(4)]
+    for target in (True, False)
+}
+extension_starts = {
+    target: [sum(extension_counts[target][:left]) for left in range(4)]
+    for target in (True, False)
+}
+extension_rights = {
+    target: [right for left in range(4) for right in column_extensions[(target, left)]]
+    for target in (True, False)
+}
+
+
+def build_compact_transitions(pattern):
+    """
+    Same transitions as build_transitions, stored in three flat typed arrays
+    instead of a list of lists, and grouped by next row (so that applying a row is
+    a gather of the previous counts followed by a sum per group):
+    previous_rows[starts[k]:starts[k + 1]] are the previous rows compatible with
+    next_rows[k]. With NumPy, the pairs are also extended column by column
+    all at once, and the arrays are NumPy arrays.
+    """
+    np = load_numpy()
+    if np is None:
+        previous_rows = array("L", [0, 1, 0, 1])
+        next_rows = array("L", [0, 0, 1, 1])
+        for i, target in enumerate(pattern):
+            extended_previous_rows = array("L")
+            extended_next_rows = array("L")
+            for previous_row, next_row in zip(previous_rows, next_rows):
+                left = (previous_row >> i & 1) | (next_row >> i & 1) << 1
+                for right in column_extensions[(target, left)]:
+                    extended_previous_rows.append(previous_row | (right & 1) << (i + 1))
+                    extended_next_rows.append(next_row | (right >> 1) << (i + 1))
+            previous_rows = extended_previous_rows
+            next_rows = extended_next_rows
+
+        # Counting sort of the pairs by next row
+        offsets = [0] * ((1 << (len(pattern) + 1)) + 1)
+        for next_row in next_rows:
+            offsets[next_row + 1] += 1
+        for row in range(1, len(offsets)):
+            offsets[row] += offsets[row - 1]
+        grouped_previous_rows = array("L", [0]) * len(previous_rows)
+        positions = offsets[:-1]
+        for previous_row, next_row in zip(previous_rows, next_rows):
+            grouped_previous_rows[positions[next_row]] = previous_row
+            positions[next_row] += 1
+        next_rows = array(
+            "L",
+            [row for row in range(len(offsets) - 1) if offsets[row + 1] > offsets[row]],
+        )
+        starts = array("L", [offsets[row] for row in next_rows])
+        starts.append(len(grouped_previous_rows))
+        return next_rows, starts, grouped_previous_rows
+
+    # (32-bit rows, a dense frontier of more than 2^31 rows wouldn't fit anyway)
+    previous_rows = np.arange(4, dtype=np.int32) & 1
+    next_rows = np.arange(4, dtype=np.int32) >> 1
+    for i, target in enumerate(pattern):
+        left = (previous_rows >> i & 1) | (next_rows >> i & 1) << 1
+        repeats = np.array(extension_counts[target], dtype=np.int32)[left]
+        previous_rows = np.repeat(previous_rows, repeats)
+        next_rows = np.repeat(next_rows, repeats)
+        # k-th extension of each pair
+        ends = np.cumsum(repeats)
+        k = np.arange(len(previous_rows), dtype=np.int32) - np.repeat(
+            ends - repeats, repeats
+        )
+        right = np.array(extension_rights[target], dtype=np.int32)[
+            np.array(extension_starts[target])[np.repeat(left, repeats)] + k
+        ]
+        previous_rows |= (right & 1) << (i + 1)
+        next_rows |= (right >> 1) << (i + 1)
+
+    order = np.argsort(next_rows, kind="stable")
+    next_rows, starts = np.unique(next_rows[order], return_index=True)
+    return (
+        next_rows,
+        np.append(starts, len(order)).astype(np.int32),
+        previous_rows[order],
+    )
+
+
+# Shared by all the compact_solution calls in this process
+compact_transition_cache = TransitionCache(build=build_compact_transitions)
+
+
+def reset():
+    """
+    Empties the transition and answer caches, so that the next call starts cold.
+    """
+    transition_cache.clear()
+    answer_cache.clear()
+    compact_transition_cache.clear()
+
+
+# With NumPy, counts are split in 32-bit limbs stored in int64 arrays (the
+# answers need way more than 64 bits): a sum of less than 2^31 limbs can't
+# overflow, and there are at most 2^(m+1) previous rows in a group
+LIMB_BITS = 32
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+
+def carry_limbs(limbs):
+    """
+    Propagates the carries of a list of limb arrays (limbs[i] has the weight
+    2^(32 i)), adding limbs when needed, so that every limb is below 2^32 again.
+    """
+    i = 0
+    while i < len(limbs):
+        carry = limbs[i] >> LIMB_BITS
+        if carry.any():
+            limbs[i] = limbs[i] & LIMB_MASK
+            if i + 1 == len(limbs):
+                limbs.append(carry)
+            else:
+                limbs[i + 1] = limbs[i + 1] + carry
+        i += 1
+    return limbs
+
+
+def compact_count_preimages(patterns, cache):
+    """
+    Same as count_preimages, with the compact transitions of the cache (see
+    build_compact_transitions). The counts are still dense (indexed by the row
+    bitmask), as a list of ints, or a list of limb arrays with NumPy, where each
+    row is applied with one gather and one sum per group (np.add.reduceat).
+    """
+    n_states = 1 << (len(patterns[0]) + 1)
+    np = load_numpy()
+    if np is None:
+        counts = [1] * n_states
+        for pattern in patterns:
+            next_rows, starts, previous_rows = cache.get(pattern)
+            new_counts = [0] * n_states
+            for k, next_row in enumerate(next_rows):
+                new_counts[next_row] = sum(
+                    [counts[row] for row in previous_rows[starts[k] : starts[k + 1]]]
+                )
+            counts = new_counts
+            if recorder is not None:
+                recorder.observe("frontier_size", n_states - counts.count(0))
+
+            # No working possibilities at that stage ("garden of eden")
+            if not any(counts):
+                return 0
+        return sum(counts)
+
+    limbs = [np.ones(n_states, dtype=np.int64)]
+    for pattern in patterns:
+        next_rows, starts, previous_rows = cache.get(pattern)
+        if not len(next_rows):
+            return 0  # garden of eden
+        new_limbs = []
+        for limb in limbs:
+            new_limb = np.zeros(n_states, dtype=np.int64)
+            new_limb[next_rows] = np.add.reduceat(limb[previous_rows], starts[:-1])
+            new_limbs.append(new_limb)
+        limbs = carry_limbs(new_limbs)
+        if recorder is not None:
+            recorder.observe("frontier_size", int(np.count_nonzero(sum(limbs))))
+
+        if not any(limb.any() for limb in limbs):
+            return 0
+    return sum(int(limb.sum()) << (LIMB_BITS * i) for i, limb in enumerate(limbs))
+
+
+def compact_solution(nebula, cache=None):
+    """
+    Same as solution, with the compact backend (see compact_count_preimages) and
+    the compact_transition_cache (unless another cache is given). The transitions
+    take about 4 times less memory. With NumPy it is also a few times faster,
+    without it about as fast as solution.
+    """
+    if cache is None:
+        cache = compact_transition_cache
+    with phase(recorder, "normalize"):
+        patterns = normalize_nebula(nebula)
+    with phase(recorder, "count_preimages"):
+        return compact_count_preimages(patterns, cache)
+
+
+def evolve(state):
+    """
+    Applies the nebula process once (forward) to a state, which is handy to build
+    nebulae that are known to have at least one previous state.
+    """
+    return [
+        [
+            combination[
+                (state[i][j], state[i][j + 1], state[i + 1][j], state[i + 1][j + 1])
+            ]
+            for j in range(len(state[0]) - 1)
+        ]
+        for i in range(len(state) - 1)
+    ]
+
+
+# Transitions of every distinct row of the nebula, set in each worker process of
+# parallel_solution by start_expand_worker
+expand_transitions = None
+
+
+def start_expand_worker(transitions):
+    global expand_transitions
+    expand_transitions = transitions
+
+
+def expand_shard(task):
+    """
+    Worker side of parallel_solution: applies one nebula row to a shard of the
+    working rows ((row bitmask, count) pairs) and returns the partial counts in the
+    same sparse form, so that only the rows reached go back to the parent process.
+    """
+    pattern, shard = task
+    transitions = expand_transitions[pattern]
+    partial_counts = defaultdict(int)
+    for previous_row, count in shard:
+        for next_row in transitions[previous_row]:
+            partial_counts[next_row] += count
+    return list(partial_counts.items())
+
+
+def parallel_solution(nebula, workers=None):
+    """
+    Same as solution(), but the working rows are split across a pool of worker
+    processes at each row (interleaved, to balance the shards), and the partial
+    counts are summed back before moving to the next row. The transitions are
+    built once, by this process (through transition_cache), and sent to each
+    worker when it starts.
+    workers defaults to the number of CPUs; with a single worker, this is solution().
+    """
+    import multiprocessing  # slow to import, and only needed here
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers == 1:
+        return solution(nebula)
+
+    patterns = normalize_nebula(nebula)
+    transitions = {}
+    for pattern in patterns:
+        if pattern not in transitions:
+            transitions[pattern] = transition_cache.get(pattern)
+
+    working_rows = [(row, 1) for row in range(1 << (len(patterns[0]) + 1))]
+    with multiprocessing.Pool(
+        workers, initializer=start_expand_worker, initargs=(transitions,)
+    ) as pool:
+        for pattern in patterns:
+            shards = [(pattern, working_rows[i::workers]) for i in range(workers)]
+            counts = defaultdict(int)
+            for partial_counts in pool.map(expand_shard, shards):
+                for row, count in partial_counts:
+                    counts[row] += count
+            working_rows = list(counts.items())
+
+            # No working possibilities at that stage ("garden of eden")
+            if not working_rows:
+                return 0
+
+    return sum(count for _, count in working_rows)
+
+
+BOUNDARIES = ("free", "fixed", "toroidal")
+
+
+class CellularAutomaton(object):
+    """
+    Preimage counter for any automaton where each cell is a function of a k x k
+    window of the previous state (k >= 2, stride 1), given as a lookup table: rule
+    maps each window (a tuple of the k * k cells of the previous state, row by
+    row) to the cell it produces, e.g. combination for the nebula. Windows missing
+    from the table can't produce anything. Previous states are made of booleans,
+    the produced cells can be any hashable value.
+
+    The rule is compiled once into its column extensions (see column_extensions),
+    and the transfer-matrix transitions of each row pattern are kept in a cache,
+    as for the nebula. The transfer-matrix states are the last k - 1 rows of the
+    previous state, as a bitmask (row t is at the bits t * width and above).
+
+    The boundary can be:
+    - "free": as for the nebula, the previous state has k - 1 more rows and
+    columns than the grid.
+    - "fixed": the previous state has the same size as the grid, the cells around
+    it are boundary_value, and the window of a cell starts (k - 1) // 2 cells
+    before it in both directions.
+    - "toroidal": the previous state has the same size as the grid, and wraps
+    around in both directions (the window of a cell starts at the cell). The grid
+    needs at least k - 1 rows and columns.
+    """
+
+    def __init__(self, rule, cache_size=256):
+        window_cells = len(next(iter(rule)))
+        self.window_size = k = int(round(window_cells**0.5))
+        if k < 2 or k * k != window_cells:
+            raise ValueError("rule windows must be k x k squares, with k >= 2")
+        self.rule = dict(rule)
+
+        # As column_extensions: a column is encoded on k bits (bit t is the cell
+        # of the row t of the window), and the left columns are the k - 1 first
+        # columns of the window, packed (the first one on the lowest bits)
+        self.extensions = defaultdict(list)
+        for window, target in self.rule.items():
+            columns = [
+                sum(bool(window[t * k + c]) << t for t in range(k)) for c in range(k)
+            ]
+            left = sum(column << (k * c) for c, column in enumerate(columns[:-1]))
+            self.extensions[(target, left)].append(columns[-1])
+        self.extensions = dict(self.extensions)
+
+        self.transition_cache = TransitionCache(
+            cache_size, build=self.build_transitions
+        )
+        self.transposed_automaton = None
+
+    def transposed(self):
+        """
+        The same automaton, with transposed windows (compiled on first use): the
+        preimages of the transposed grid are the transposed preimages.
+        """
+        if self.transposed_automaton is None:
+            k = self.window_size
+            self.transposed_automaton = CellularAutomaton(
+                {
+                    tuple(window[t * k + c] for c in range(k) for t in range(k)): target
+                    for window, target in self.rule.items()
+                },
+                self.transition_cache.maxsize,
+            )
+            self.transposed_automaton.transposed_automaton = self
+        return self.transposed_automaton
+
+    def build_transitions(self, key):
+        """
+        Transitions for one grid row (key is the (pattern, boundary, boundary
+        value) triple): a dict mapping each state to the list of its next states.
+        As in build_transitions, the (state, next row) pairs are built column by
+        column, going through the k - 1 extra columns of the previous state (the
+        boundary cells, or the first columns again when toroidal).
+        """
+        pattern, boundary, boundary_value = key
+        k = self.window_size
+        if boundary == "free":
+            width = len(pattern) + k - 1
+            real_columns = list(range(width))
+        elif boundary == "fixed":
+            width = len(pattern)
+            before = (k - 1) // 2
+            real_columns = [
+                v - before if 0 <= v - before < width else None
+                for v in range(width + k - 1)
+            ]
+        else:
+            width = len(pattern)
+            real_columns = [v % width for v in range(width + k - 1)]
+        boundary_column = (1 << k) - 1 if boundary_value else 0
+
+        # (state, next row, left columns of the next window)
+        pairs = [(0, 0, 0)]
+        seen_columns = set()
+        for v, real_column in enumerate(real_columns):
+            is_new_column = real_column is not None and real_column not in seen_columns
+            if is_new_column:
+                # Bits set in the state and in the next row by each column value
+                spread = [
+                    (
+                        sum(
+                            (column >> t & 1) << (t * width + real_column)
+                            for t in range(k - 1)
+                        ),
+                        (column >> (k - 1) & 1) << real_column,
+                    )
+                    for column in range(1 << k)
+                ]
+
+            extended_pairs = []
+            for state, next_row, left in pairs:
+                if is_new_column:
+                    columns = range(1 << k)
+                elif real_column is None:
+                    columns = [boundary_column]
+                else:
+                    # Toroidal, the column is already known
+                    columns = [
+                        sum(
+                            (state >> (t * width + real_column) & 1) << t
+                            for t in range(k - 1)
+                        )
+                        | (next_row >> real_column & 1) << (k - 1)
+                    ]
+                if v >= k - 1:
+                    allowed = self.extensions.get((pattern[v - k + 1], left), ())
+                    if is_new_column:
+                        columns = allowed
+                    else:
+                        columns = [column for column in columns if column in allowed]
+                for column in columns:
+                    extended_state, extended_next_row = state, next_row
+                    if is_new_column:
+                        extended_state |= spread[column][0]
+                        extended_next_row |= spread[column][1]
+                    extended_pairs.append(
+                        (
+                            extended_state,
+                            extended_next_row,
+                            (left >> k) | column << (k * (k - 2)),
+                        )
+                    )
+            pairs = extended_pairs
+            if real_column is not None:
+                seen_columns.add(real_column)
+
+        transitions = defaultdict(list)
+        for state, next_row, _ in pairs:
+            transitions[state].append((state >> width) | next_row << ((k - 2) * width))
+        return dict(transitions)
+
+    def count_preimages(self, grid, boundary="free", boundary_value=False):
+        """
+        Number of previous states leading to the grid (a list of rows). As for the
+        nebula, the grid is transposed (along with the rule) if it has more
+        columns than rows, so that the states are as small as possible.
+        """
+        if boundary not in BOUNDARIES:
+            raise ValueError(
+                "unknown boundary %r (choose from %s)"
+                % (boundary, ", ".join(BOUNDARIES))
+            )
+        automaton = self
+        if len(grid) < len(grid[0]):
+            automaton = self.transposed()
+            grid = list(zip(*grid))
+        patterns = [tuple(row) for row in grid]
+
+        k = self.window_size
+        if boundary == "toroidal" and min(len(patterns), len(patterns[0])) < k - 1:
+            raise ValueError(
+                "toroidal grids need at least %d rows and columns" % (k - 1)
+            )
+        cache = automaton.transition_cache
+        width = len(patterns[0]) + (k - 1 if boundary == "free" else 0)
+
+        if boundary == "toroidal":
+            # The last k - 1 rows are the first ones again, so we count the
+            # paths going back to their starting state: counts are kept by
+            # (starting state, state) pair
+            transitions = cache.get((patterns[0], boundary, boundary_value))
+            counts = defaultdict(int)
+            for state, next_states in transitions.items():
+                for next_state in next_states:
+                    counts[(state, next_state)] += 1
+            for pattern in patterns[1:]:
+                transitions = cache.get((pattern, boundary, boundary_value))
+                new_counts = defaultdict(int)
+                for (start, state), count in counts.items():
+                    for next_state in transitions.get(state, ()):
+                        new_counts[(start, next_state)] += count
+                counts = new_counts
+                if not counts:
+                    return 0
+            return sum(
+                count for (start, state), count in counts.items() if start == state
+            )
+
+        # With a fixed boundary, the first rows of the first state and the last
+        # rows of the last state are outside of the grid
+        n_boundary_rows = (k - 1) // 2 if boundary == "fixed" else 0
+        boundary_row = (1 << width) - 1 if boundary_value else 0
+        first_rows = sum(boundary_row << (t * width) for t in range(n_boundary_rows))
+        first_rows_mask = (1 << (n_boundary_rows * width)) - 1
+
+        counts = defaultdict(int)
+        transitions = cache.get((patterns[0], boundary, boundary_value))
+        for state, next_states in transitions.items():
+            if state & first_rows_mask == first_rows:
+                for next_state in next_states:
+                    counts[next_state] += 1
+        for pattern in patterns[1:]:
+            transitions = cache.get((pattern, boundary, boundary_value))
+            new_counts = defaultdict(int)
+            for state, count in counts.items():
+                for next_state in transitions.get(state, ()):
+                    new_counts[next_state] += count
+            counts = new_counts
+
+            # No working possibilities at that stage ("garden of eden")
+            if not counts:
+                return 0
+
+        if boundary == "fixed":
+            n_last_rows = k - 1 - n_boundary_rows
+            shift = (k - 1 - n_last_rows) * width
+            last_rows = sum(boundary_row << (t * width) for t in range(n_last_rows))
+            return sum(
+                count for state, count in counts.items() if state >> shift == last_rows
+            )
+        return sum(counts.values())
+
+    def evolve(self, state, boundary="free", boundary_value=False):
+        """
+        Applies the rule once (forward) to a state, with the same boundaries as
+        count_preimages (KeyError if a window is missing from the rule).
+        """
+        k = self.window_size
+        n_rows, n_columns = len(state), len(state[0])
+
+        def cell(i, j):
+            if boundary == "toroidal":
+                return bool(state[i % n_rows][j % n_columns])
+            if 0 <= i < n_rows and 0 <= j < n_columns:
+                return bool(state[i][j])
+            return boundary_value
+
+        before = (k - 1) // 2 if boundary == "fixed" else 0
+        margin = k - 1 if boundary == "free" else 0
+        return [
+            [
+                self.rule[
+                    tuple(
+                        cell(i - before + t, j - before + c)
+                        for t in range(k)
+                        for c in range(k)
+                    )
+                ]
+                for j in range(n_columns - margin)
+            ]
+            for i in range(n_rows - margin)
+        ]
+
+
+if __name__ == "__main__":
+    import time
+
+    nebulae = [
+        ([[True, False, True], [False, True, False], [True, False, True]], 4),
+        (
+            [
+                [True, True, False, True, False, True, False, True, True, False],
+                [True, True, False, False, False, False, True, True, True, False],
+                [True, True, False, False, False, False, False, False, False, True],
+                [False, True, False, False, False, False, True, True, False, False],
+            ],
+            11567,
+        ),
+        (
+            [
+                [True, False, True, False, False, True, True, True],
+                [True, False, True, False, False, False, True, False],
+                [True, True, True, False, False, False, True, False],
+                [True, False, True, False, False, False, True, False],
+                [True, False, True, False, False, True, True, True],
+            ],
+            254,
+        ),
+    ]
+
+    for nebula, expected in nebulae:
+        print("nebula %dx%d (expected %d)" % (len(nebula), len(nebula[0]), expected))
+        for function in (row_by_row_solution, solution):
+            start = time.time()
+            answer = function(nebula)
+            end = time.time()
+            assert answer == expected
+            print("  %-20s %8d  took %.4fs" % (function.__name__, answer, end - start))
+
+    # Batches of nebulae sharing their columns, cold then warm cache
+    import random
+
+    randomizer = random.Random(0)
+    columns = [[randomizer.random() < 0.3 for _ in range(9)] for _ in range(12)]
+    grids = [
+        [list(row) for row in zip(*randomizer.choices(columns, k=30))]
+        for _ in range(20)
+    ]
+    batch = [randomizer.choice(grids) for _ in range(50)]
+    for label in ("cold", "warm"):
+        if label == "cold":
+            transition_cache.clear()
+            answer_cache.clear()
+        start = time.time()
+        batch_solution(batch)
+        end = time.time()
+        print("batch of %d (%s cache) took %.4fs" % (len(batch), label, end - start))
+        print("  transitions", transition_cache.stats())
+        print("  answers", answer_cache.stats())
+
+    # Memory and time of the two backends on a wide nebula (9x50, so 10 bits per
+    # row), cold then warm cache, and peak memory from a cold cache (measured
+    # separately, since tracemalloc slows things down)
+    import tracemalloc
+
+    state = [[randomizer.random() < 0.5 for _ in range(51)] for _ in range(10)]
+    nebula = evolve(state)
+    load_numpy()
+    for function, cache in (
+        (solution, transition_cache),
+        (compact_solution, compact_transition_cache),
+    ):
+        timings = []
+        for label in ("cold", "warm"):
+            if label == "cold":
+                cache.clear()
+            start = time.time()
+            function(nebula)
+            end = time.time()
+            timings.append(end - start)
+        cache.clear()
+        tracemalloc.start()
+        function(nebula)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            "%-16s 9x50: took %.4fs cold, %.4fs warm (peak memory %d bytes)"
+            % ((function.__name__,) + tuple(timings) + (peak_memory,))
+        )
+    print("  (NumPy: %s)" % ("yes" if load_numpy() is not None else "no"))
+
+    # The same nebula with the general engine, then the game of life (3x3 windows)
+    nebula_automaton = CellularAutomaton(combination)
+    for label in ("cold", "warm"):
+        start = time.time()
+        answer = nebula_automaton.count_preimages(nebula)
+        end = time.time()
+        assert answer == solution(nebula)
+        print("CellularAutomaton 9x50 (%s cache) took %.4fs" % (label, end - start))
+
+    life = CellularAutomaton(
+        {
+            window: sum(window) - window[4] == 3
+            or (window[4] and sum(window) - window[4] == 2)
+            for window in product([False, True], repeat=9)
+        }
+    )
+    glider = [
+        [False, True, False, False, False, False],
+        [False, False, True, False, False, False],
+        [True, True, True, False, False, False],
+        [False, False, False, False, False, False],
+        [False, False, False, False, False, False],
+    ]
+    for boundary in BOUNDARIES:
+        start = time.time()
+        answer = life.count_preimages(glider, boundary)
+        end = time.time()
+        print(
+            "game of life, glider (%s boundary): %d preimages, took %.4fs"
+            % (boundary, answer, end - start)
+        )
+
+    # Scaling of the parallel mode on the same nebula (a single worker runs the
+    # serial solution, not the sharded code), every configuration starting cold
+    expected = solution(nebula)
+    for workers in (1, 2, 4, 8):
+        transition_cache.clear()
+        start = time.time()
+        answer = parallel_solution(nebula, workers)
+        end = time.time()
+        assert answer == expected
+        print(
+            "parallel_solution, %s: %d, took %.4fs"
+            % (
+                "serial" if workers == 1 else "%d workers" % workers,
+                answer,
+                end - start,
+            )
+        )